@@ -37,6 +37,9 @@ __all__ = ['BanquePopulaire']
 class BanquePopulaire(Browser):
     PROTOCOL = 'https'
     ENCODING = 'iso-8859-15'
+    # Backends of most regional banks are served by the same hosts.
+    RATE_LIMIT = 2
+    RATE_LIMIT_BURST = 5
     PAGES = {'https://[^/]+/auth/UI/Login.*':                                                   LoginPage,
              'https://[^/]+/cyber/internet/Login.do':                                           IndexPage,
              'https://[^/]+/cyber/internet/StartTask.do\?taskInfoOID=mesComptes.*':             AccountsPage,
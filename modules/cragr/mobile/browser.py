@@ -34,6 +34,9 @@ class CragrMobile(Browser):
     PROTOCOL = 'https'
     ENCODING = 'utf-8'
     USER_AGENT = Browser.USER_AGENTS['wget']
+    # Backends of every region are served by the same hosts.
+    RATE_LIMIT = 2
+    RATE_LIMIT_BURST = 5
     # a session id that is sometimes added, and should be ignored when matching pages
     SESSION_REGEXP = '(?:|%s[A-Z0-9]+)' % re.escape(r';jsessionid=')
 
@@ -41,6 +41,9 @@ __all__ = ['Cragr']
 class Cragr(Browser):
     PROTOCOL = 'https'
     ENCODING = 'ISO-8859-1'
+    # Backends of every region are served by the same hosts.
+    RATE_LIMIT = 2
+    RATE_LIMIT_BURST = 5
 
     PAGES = {'https?://[^/]+/':                                          HomePage,
              'https?://[^/]+/particuliers.html':                         HomePage,
@@ -46,7 +46,9 @@ class DailymotionBrowser(PagesBrowser):
         PagesBrowser.__init__(self, *args, **kwargs)
 
     def get_video(self, _id, video=None):
-        video = self.video_page.go(_id=_id).get_video(obj=video)
+        # The page is opened without changing the browser's location, so
+        # several videos can be filled at the same time.
+        video = self.video_page.open(_id=_id).get_video(obj=video)
 
         if video._formats and self.format in video._formats:
             video.ext = self.format
@@ -53,6 +53,9 @@ class DailymotionModule(Module, CapVideo, CapCollection):
 
     SORTBY = ['relevance', 'rated', 'visited', None]
 
+    # Videos are filled without using the current page of the browser.
+    FILL_BATCH_SIZE = 4
+
     def create_default_browser(self):
         resolution = self.config['resolution'].get()
         format = self.config['format'].get()
@@ -78,6 +78,9 @@ class ImgurModule(Module, CapPaste, CapGallery, CapImage):
 
     BROWSER = ImgurBrowser
 
+    # Images are public files of i.imgur.com.
+    STREAM_IMAGES = True
+
     IMGURL = re.compile(r'https?://(?:[a-z]+\.)?imgur.com/([a-zA-Z0-9]+)(?:\.[a-z]+)?$')
     GALLURL = re.compile(r'https?://(?:[a-z]+\.)?imgur.com/a/([a-zA-Z0-9]+)/?$')
     ID = re.compile(r'[0-9a-zA-Z]+$')
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Compare the cost of finding the page of an URL in the PAGES table of a
+# deprecated browser, when regexps are compiled for every response (as it
+# was done before) and when the compiled table is kept on the class.
+
+from __future__ import print_function
+
+import re
+import sys
+import timeit
+
+from weboob.deprecated.browser import Browser, Page
+
+
+def legacy_find_page(browser, url):
+    for key, value in browser.PAGES.items():
+        if isinstance(key, basestring):
+            if not key.startswith('^') and not key.endswith('$'):
+                regexp = re.compile('^%s$' % key)
+            else:
+                regexp = re.compile(key)
+        else:
+            regexp = key
+        m = regexp.search(url)
+        if m:
+            if isinstance(value, (list, tuple)):
+                return value[0], value[1], m
+            return value, browser.parser, m
+    return None, None, None
+
+
+def main(count=50, number=2000):
+    pages = dict((r'https://www.example.com/(?P<space>\w+)/page%d\.do\?id=(\d+).*' % i,
+                  type('Page%d' % i, (Page,), {}))
+                 for i in xrange(count))
+    BenchBrowser = type('BenchBrowser', (Browser,), {'PAGES': pages})
+    # Only PAGES and the parser are needed to find pages.
+    browser = BenchBrowser.__new__(BenchBrowser)
+    browser.parser = None
+
+    urls = ['https://www.example.com/perso/page%d.do?id=42&x=y' % i for i in xrange(count)]
+    urls.append('https://www.example.com/unknown')
+
+    for url in urls:
+        assert legacy_find_page(browser, url)[0] is browser.find_page(url)[0]
+
+    for name, func in (('legacy', legacy_find_page), ('compiled', BenchBrowser.find_page)):
+        duration = timeit.timeit(lambda: [func(browser, url) for url in urls], number=number)
+        print('%-10s %8.2f us per URL' % (name, duration * 1e6 / (number * len(urls))))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Compare the cost of repeated calls to a Javascript function when a node
+# process is started for each call (as PyExecJS does with node) and when
+# calls are sent to the shared runtime of weboob.tools.js.
+
+from __future__ import print_function
+
+import subprocess
+import sys
+import time
+
+from weboob.tools.js import Javascript, get_runtime
+from weboob.tools.json import json
+
+
+SCRIPT = """
+function hash(s) {
+    var h = 0;
+    for (var i = 0; i < s.length; i++)
+        h = (h * 31 + s.charCodeAt(i)) | 0;
+    return h;
+}
+"""
+
+
+def spawn_call(source, name, *args):
+    code = '%s\nprocess.stdout.write(JSON.stringify(%s.apply(this, %s)));' % (source, name, json.dumps(args))
+    return json.loads(subprocess.check_output([get_runtime().path, '-e', code]))
+
+
+def main(number=20):
+    if get_runtime() is None:
+        print('node is not installed', file=sys.stderr)
+        return 1
+
+    source = Javascript.HEADER + SCRIPT
+    start = time.time()
+    for i in xrange(number):
+        spawn_call(source, 'hash', 'password%d' % i)
+    spawned = time.time() - start
+
+    start = time.time()
+    for i in xrange(number):
+        Javascript(SCRIPT).call('hash', 'password%d' % i)
+    pooled = time.time() - start
+
+    print('process per call %8.2f ms per call' % (spawned * 1000 / number))
+    print('shared runtime   %8.2f ms per call' % (pooled * 1000 / number))
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
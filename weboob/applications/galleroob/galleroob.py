@@ -20,8 +20,15 @@
 from __future__ import print_function
 
 import os
+import time
+from collections import deque
 from re import search, sub
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
 from weboob.tools.application.repl import ReplApplication, defaultcount
 from weboob.capabilities.base import empty
 from weboob.capabilities.gallery import CapGallery, BaseGallery, BaseImage
@@ -59,6 +66,10 @@ class Galleroob(ReplApplication):
     def __init__(self, *args, **kwargs):
         ReplApplication.__init__(self, *args, **kwargs)
 
+    def add_application_options(self, group):
+        group.add_option('-j', '--jobs', type='int', default=4,
+                         help='number of images downloaded in parallel, when the module allows it (default: 4)')
+
     @defaultcount(10)
     def do_search(self, pattern):
         """
@@ -111,32 +122,129 @@ class Galleroob(ReplApplication):
             pass  # ignore error on existing directory
         os.chdir(dest)  # fail here if dest couldn't be created
 
-        i = 0
-        for img in self.weboob[backend].iter_gallery_images(gallery):
-            i += 1
-            if i < first:
-                continue
-
-            self.weboob[backend].fillobj(img, ('url', 'data'))
-            if img.data is None:
-                self.weboob[backend].fillobj(img, ('url', 'data'))
-                if img.data is None:
-                    print("Couldn't get page %d, exiting" % i, file=self.stderr)
-                    break
-
-            ext = search(r"\.([^\.]{1,5})$", img.url)
-            if ext:
-                ext = ext.group(1)
+        jobs = max(1, self.options.jobs)
+        backend = self.weboob[backend]
+        browser = getattr(backend, 'browser', None)
+        # Images are downloaded in parallel only when the module tells a
+        # GET request on their URL is enough. Otherwise their data is
+        # filled one by one, as module browsers can't be used by several
+        # threads at once.
+        stream = getattr(backend, 'STREAM_IMAGES', False) and hasattr(browser, 'async_open') \
+            and ThreadPoolExecutor is not None
+
+        pending = deque()
+        count = size = 0
+        start = time.time()
+        try:
+            i = 0
+            for img in backend.iter_gallery_images(gallery):
+                i += 1
+                if i < first:
+                    continue
+
+                backend.fillobj(img, ('url',))
+
+                ext = search(r"\.([^\.]{1,5})$", img.url)
+                if ext:
+                    ext = ext.group(1)
+                else:
+                    ext = "jpg"
+
+                name = '%03d.%s' % (i, ext)
+                # Images are written to a temporary file, so an existing file
+                # is complete.
+                if os.path.exists(name) and (empty(img.size) or os.path.getsize(name) == img.size):
+                    print('Skipping existing file %s' % name)
+                    continue
+
+                if not stream:
+                    written = self.wait_image(i, name, lambda: self.fetch_image(backend, img, name))
+                    if written is None:
+                        break
+                    count += 1
+                    size += written
+                    continue
+
+                future = browser.open(img.url, stream=True, is_async=True,
+                                      callback=lambda response, name=name: self.write_response(response, name))
+                pending.append((i, name, future))
+
+                # Do not prefetch more than the number of jobs.
+                if len(pending) >= jobs:
+                    i_, name_, future = pending.popleft()
+                    written = self.wait_image(i_, name_, future.result)
+                    if written is None:
+                        break
+                    count += 1
+                    size += written
             else:
-                ext = "jpg"
+                while pending:
+                    i, name, future = pending.popleft()
+                    written = self.wait_image(i, name, future.result)
+                    if written is None:
+                        break
+                    count += 1
+                    size += written
+        finally:
+            for i, name, future in pending:
+                future.cancel()
+            for i, name, future in pending:
+                if not future.cancelled():
+                    self.wait_image(i, name, future.result)
+
+        elapsed = max(time.time() - start, 0.001)
+        print('Downloaded %d files (%.1f MB) in %.1fs, %.1f kB/s' %
+              (count, size / 1048576., elapsed, size / 1024. / elapsed))
 
-            name = '%03d.%s' % (i, ext)
-            print('Writing file %s' % name)
+        os.chdir(os.path.pardir)
+
+    def fetch_image(self, backend, img, name):
+        """
+        Get an image with the data field of the backend, and write it.
+        """
+        backend.fillobj(img, ('data',))
+        if img.data is None:
+            backend.fillobj(img, ('data',))
+        if img.data is None:
+            raise ValueError('No data')
+
+        with open(name + '.part', 'wb') as f:
+            f.write(img.data)
+        os.rename(name + '.part', name)
+        size = len(img.data)
+        img.data = None
+        return size
+
+    def write_response(self, response, name):
+        """
+        Write the body of a streamed response.
+        """
+        size = 0
+        try:
+            with open(name + '.part', 'wb') as f:
+                for chunk in response.iter_content(65536):
+                    f.write(chunk)
+                    size += len(chunk)
+        finally:
+            response.close()
+        os.rename(name + '.part', name)
+        return size
+
+    def wait_image(self, i, name, download):
+        """
+        Wait for an image download.
 
-            with open(name, 'wb') as f:
-                f.write(img.data)
+        :param download: function returning the size of the written file
+        :returns: size of the written file, or None if the download has failed
+        """
+        try:
+            size = download()
+        except Exception as e:
+            print("Couldn't get page %d (%s), exiting" % (i, e), file=self.stderr)
+            return None
 
-        os.chdir(os.path.pardir)
+        print('Wrote file %s (%.1f kB)' % (name, size / 1024.))
+        return size
 
     def do_info(self, line):
         """
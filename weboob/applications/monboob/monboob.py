@@ -20,23 +20,36 @@
 from __future__ import print_function
 
 from email.mime.text import MIMEText
-from smtplib import SMTP
+from smtplib import SMTP, SMTPException, SMTPServerDisconnected
 from email.Header import Header, decode_header
 from email.Utils import parseaddr, formataddr, formatdate
 from email import message_from_file, message_from_string
 from smtpd import SMTPServer
+import heapq
+import os
 import time
 import re
 import logging
 import asyncore
 import subprocess
 import socket
+import threading
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
 
 from weboob.core import Weboob, CallErrors
-from weboob.core.scheduler import Scheduler
+from weboob.core.scheduler import IScheduler
 from weboob.capabilities.messages import CapMessages, CapMessagesPost, Thread, Message
 from weboob.tools.application.repl import ReplApplication
 from weboob.tools.date import utc2local
+from weboob.tools.log import getLogger
 from weboob.tools.html import html2text
 from weboob.tools.misc import get_backtrace, to_unicode
 
@@ -51,15 +64,315 @@ class FakeSMTPD(SMTPServer):
 
     def process_message(self, peer, mailfrom, rcpttos, data):
         msg = message_from_string(data)
-        self.app.process_incoming_mail(msg)
+        # Posting the message may be slow, do not block the event loop.
+        self.app.weboob.scheduler.dispatch(self.app.process_incoming_mail, msg)
+
+
+class Waker(asyncore.file_dispatcher):
+    """
+    Pipe used by other threads to wake up the event loop.
+    """
+
+    def __init__(self):
+        rfd, self.wfd = os.pipe()
+        asyncore.file_dispatcher.__init__(self, rfd)
+        # file_dispatcher works on a copy of the descriptor.
+        os.close(rfd)
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        self.recv(4096)
+
+    def wake(self):
+        os.write(self.wfd, b'x')
+
+    def close(self):
+        asyncore.file_dispatcher.close(self)
+        os.close(self.wfd)
+
+
+class DeliveryError(Exception):
+    pass
+
+
+class MailDelivery(object):
+    """
+    Queue of mails to deliver.
+
+    Mails are sent by a pool of worker threads, so the fetching of messages
+    on backends is not blocked by a slow mail server. Each worker keeps its
+    SMTP connection open between mails, and failed deliveries are retried
+    with an exponential backoff.
+
+    :param app: application
+    :type app: :class:`Monboob`
+    :param workers: number of parallel deliveries
+    :type workers: int
+    :param retries: number of retries of a failed delivery
+    :type retries: int
+    :param backoff: delay in seconds before the first retry, doubled each time
+    :type backoff: int
+    """
+
+    IDLE_TIMEOUT = 30
+    """
+    Seconds of inactivity after which a worker closes its SMTP connection.
+    """
+
+    def __init__(self, app, workers=1, retries=3, backoff=5):
+        self.app = app
+        self.logger = app.logger
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = Queue.Queue()
+        self.stop_event = threading.Event()
+        self.threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker_run)
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def put(self, sender, recipient, msg, callback=None):
+        """
+        Add a mail to the queue.
+
+        :param sender: envelope sender
+        :param recipient: envelope recipient
+        :param msg: the mail to deliver
+        :type msg: :class:`email.message.Message`
+        :param callback: function called once the mail is processed, with
+                         True if it has been delivered, False otherwise
+        :type callback: callable
+        """
+        self.queue.put((sender, recipient, msg, callback))
+
+    def join(self):
+        """
+        Wait until every queued mail has been processed.
+        """
+        self.queue.join()
+
+    def stop(self):
+        """
+        Process mails still in queue without retrying failures, then stop
+        workers.
+        """
+        self.stop_event.set()
+        for t in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+        self.threads = []
+
+    def _worker_run(self):
+        smtp = None
+        while True:
+            try:
+                item = self.queue.get(timeout=self.IDLE_TIMEOUT)
+            except Queue.Empty:
+                smtp = self._close(smtp)
+                continue
+
+            try:
+                if item is None:
+                    smtp = self._close(smtp)
+                    return
+
+                sender, recipient, msg, callback = item
+                smtp = self._process(smtp, sender, recipient, msg.as_string(), callback)
+            finally:
+                self.queue.task_done()
+
+    def _process(self, smtp, sender, recipient, data, callback):
+        attempt = 0
+        while True:
+            try:
+                smtp = self._deliver(smtp, sender, recipient, data)
+            except DeliveryError as e:
+                smtp = self._close(smtp)
+                if attempt >= self.retries or self.stop_event.is_set():
+                    self.logger.error('Unable to deliver mail: %s' % e)
+                    delivered = False
+                    break
+
+                delay = self.backoff * 2 ** attempt
+                attempt += 1
+                self.logger.warning('Unable to deliver mail: %s (retry %d/%d in %d seconds)' %
+                                    (e, attempt, self.retries, delay))
+                self.stop_event.wait(delay)
+            else:
+                delivered = True
+                break
+
+        if callback is not None:
+            try:
+                callback(delivered)
+            except Exception as e:
+                self.logger.exception(e)
+        return smtp
+
+    def _deliver(self, smtp, sender, recipient, data):
+        pipe = self.app.config.get('pipe')
+        if len(pipe) > 0:
+            p = subprocess.Popen(pipe,
+                                 shell=True,
+                                 stdin=subprocess.PIPE,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT)
+            p.stdin.write(data)
+            p.stdin.close()
+            if p.wait() != 0:
+                raise DeliveryError(p.stdout.read().strip())
+            return smtp
+
+        if smtp is not None:
+            try:
+                smtp.sendmail(sender, recipient, data)
+            except SMTPServerDisconnected:
+                # Connection has been closed by server while idle, open
+                # a new one.
+                smtp = None
+            except (SMTPException, socket.error) as e:
+                raise DeliveryError(e)
+            else:
+                return smtp
+
+        try:
+            smtp = SMTP(self.app.config.get('smtp'))
+            smtp.sendmail(sender, recipient, data)
+        except (SMTPException, socket.error) as e:
+            raise DeliveryError(e)
+        return smtp
+
+    def _close(self, smtp):
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (SMTPException, socket.error):
+                smtp.close()
+        return None
+
 
+class MonboobScheduler(IScheduler):
+    """
+    Scheduler running on a single asyncore event loop.
+
+    The loop serves the SMTP daemon and sleeps until the next scheduled
+    event, or until another thread wakes it up. Scheduled functions are
+    called in a pool of threads, so they never block the loop.
+    """
+
+    MAX_WORKERS = 4
+    """
+    Maximum of threads running scheduled functions.
+    """
 
-class MonboobScheduler(Scheduler):
     def __init__(self, app):
-        Scheduler.__init__(self)
         self.app = app
+        self.logger = getLogger('scheduler')
+        self.mutex = threading.RLock()
+        self.stop_event = threading.Event()
+        self.count = 0
+        # count -> (interval, function, args), interval is None if the
+        # function is not repeated.
+        self.queue = {}
+        # heap of (time, count)
+        self.events = []
+        self.waker = None
+        if ThreadPoolExecutor is None:
+            raise ImportError('Please install python-concurrent.futures')
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+
+    def schedule(self, interval, function, *args):
+        return self._schedule(interval, None, function, args)
+
+    def repeat(self, interval, function, *args):
+        # Like weboob.core.scheduler.RepeatedTimer, the first call is
+        # immediate.
+        return self._schedule(0, interval, function, args)
+
+    def _schedule(self, delay, interval, function, args):
+        if self.stop_event.is_set():
+            return
+
+        with self.mutex:
+            self.count += 1
+            self.logger.debug('function "%s" will be called in %s seconds' % (function.__name__, delay))
+            self.queue[self.count] = (interval, function, args)
+            heapq.heappush(self.events, (time.time() + delay, self.count))
+            self._wake()
+            return self.count
+
+    def cancel(self, ev):
+        with self.mutex:
+            try:
+                interval, function, args = self.queue.pop(ev)
+            except KeyError:
+                return False
+            # The entry in the heap is ignored when it is due.
+            self.logger.debug('scheduled function "%s" is canceled' % function.__name__)
+            return True
+
+    def dispatch(self, function, *args):
+        """
+        Call a function as soon as possible in the pool of threads.
+        """
+        return self.executor.submit(self._call, None, function, args)
+
+    def _call(self, count, function, args):
+        try:
+            function(*args)
+        except Exception:
+            # do not stop repeated calls because of an exception
+            print(get_backtrace())
+
+        if count is None:
+            return
+
+        with self.mutex:
+            try:
+                interval, function, args = self.queue[count]
+            except KeyError:
+                return
+            # Wait the interval after the end of the call, so that a slow call
+            # is never run twice at the same time.
+            self.logger.debug('function "%s" will be called in %s seconds' % (function.__name__, interval))
+            heapq.heappush(self.events, (time.time() + interval, count))
+            self._wake()
+
+    def _run_events(self):
+        """
+        Dispatch due events.
+
+        :returns: seconds before the next event, or None if there is none
+        """
+        with self.mutex:
+            now = time.time()
+            while self.events:
+                when, count = self.events[0]
+                if count not in self.queue:
+                    heapq.heappop(self.events)
+                    continue
+                if when > now:
+                    return when - now
+
+                heapq.heappop(self.events)
+                interval, function, args = self.queue[count]
+                if interval is None:
+                    self.queue.pop(count)
+                    count = None
+                self.executor.submit(self._call, count, function, args)
+            return None
+
+    def _wake(self):
+        if self.waker is not None:
+            self.waker.wake()
 
     def run(self):
+        smtpd = None
         if self.app.options.smtpd:
             if ':' in self.app.options.smtpd:
                 host, port = self.app.options.smtpd.split(':', 1)
@@ -67,25 +380,39 @@ class MonboobScheduler(Scheduler):
                 host = '127.0.0.1'
                 port = self.app.options.smtpd
             try:
-                FakeSMTPD(self.app, host, int(port))
+                smtpd = FakeSMTPD(self.app, host, int(port))
             except socket.error as e:
                 self.logger.error('Unable to start the SMTP daemon: %s' % e)
                 return False
 
-        # XXX Fuck, we shouldn't copy this piece of code from
-        # weboob.scheduler.Scheduler.run().
+        self.waker = Waker()
         try:
-            while True:
-                self.stop_event.wait(0.1)
-                if self.app.options.smtpd:
-                    asyncore.loop(timeout=0.1, count=1)
+            while not self.stop_event.is_set():
+                timeout = self._run_events()
+                asyncore.loop(timeout=timeout, count=1)
         except KeyboardInterrupt:
             self._wait_to_stop()
             raise
         else:
             self._wait_to_stop()
+        finally:
+            self.waker.close()
+            self.waker = None
+            if smtpd is not None:
+                smtpd.close()
         return True
 
+    def _wait_to_stop(self):
+        self.want_stop()
+        self.executor.shutdown(wait=True)
+
+    def want_stop(self):
+        self.stop_event.set()
+        with self.mutex:
+            self.queue = {}
+            self.events = []
+            self._wake()
+
 
 class Monboob(ReplApplication):
     APPNAME = 'monboob'
@@ -99,7 +426,9 @@ class Monboob(ReplApplication):
               'recipient': 'weboob@example.org',
               'smtp':      'localhost',
               'pipe':      '',
-              'html':      0}
+              'html':      0,
+              'workers':   1,
+              'retries':   3}
     CAPS = CapMessages
     DISABLE_REPL = True
 
@@ -130,7 +459,29 @@ class Monboob(ReplApplication):
             print('Configuration error: html must be 0 or 1.', file=self.stderr)
             return 2
 
-        return ReplApplication.main(self, argv)
+        try:
+            self.config.set('workers', int(self.config.get('workers')))
+            if self.config.get('workers') < 1:
+                raise ValueError()
+        except ValueError:
+            print('Configuration error: workers must be an integer >0.', file=self.stderr)
+            return 3
+
+        try:
+            self.config.set('retries', int(self.config.get('retries')))
+            if self.config.get('retries') < 0:
+                raise ValueError()
+        except ValueError:
+            print('Configuration error: retries must be a positive integer.', file=self.stderr)
+            return 4
+
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+        self.delivery = MailDelivery(self, self.config.get('workers'), self.config.get('retries'))
+        try:
+            return ReplApplication.main(self, argv)
+        finally:
+            self.delivery.stop()
 
     def get_email_address_ident(self, msg, header):
         s = msg.get(header)
@@ -236,7 +587,8 @@ class Monboob(ReplApplication):
                           parent=Message(thread, parent_id) if parent_id else None,
                           content=content)
         try:
-            backend.post_message(message)
+            with backend:
+                backend.post_message(message)
         except Exception as e:
             content = u'Unable to send message to %s:\n' % thread_id
             content += u'\n\t%s\n' % to_unicode(e)
@@ -264,17 +616,44 @@ class Monboob(ReplApplication):
 
         Send mails only once, then exit.
         """
-        return self.process()
+        ret = self.process()
+        self.delivery.join()
+        return ret
 
     def process(self):
         try:
             for message in self.weboob.do('iter_unread_messages'):
-                if self.send_email(message.backend, message):
-                    self.weboob[message.backend].set_message_read(message)
+                key = (message.backend, message.full_id)
+                with self.pending_lock:
+                    # The previous delivery of this message is not finished
+                    # yet, so it is not marked as read on the backend.
+                    if key in self.pending:
+                        continue
+                    self.pending.add(key)
+
+                self.send_email(message.backend, message,
+                                callback=lambda delivered, message=message: self.message_delivered(message, delivered))
         except CallErrors as e:
             self.bcall_errors_handler(e)
 
-    def send_email(self, backend_name, mail):
+    def message_delivered(self, message, delivered):
+        try:
+            if delivered:
+                backend = self.weboob[message.backend]
+                with backend:
+                    backend.set_message_read(message)
+        finally:
+            with self.pending_lock:
+                self.pending.discard((message.backend, message.full_id))
+
+    def send_email(self, backend_name, mail, callback=None):
+        """
+        Build a mail from a message and add it to the delivery queue.
+
+        :param callback: function called once the mail is processed, see
+                         :meth:`MailDelivery.put`
+        :type callback: callable
+        """
         domain = self.config.get('domain')
         recipient = self.config.get('recipient')
 
@@ -352,26 +731,120 @@ class Monboob(ReplApplication):
             msg['References'] = u" ".join(reversed(references))
 
         self.logger.info('Send mail from <%s> to <%s>' % (sender, recipient))
-        if len(self.config.get('pipe')) > 0:
-            p = subprocess.Popen(self.config.get('pipe'),
-                                 shell=True,
-                                 stdin=subprocess.PIPE,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.STDOUT)
-            p.stdin.write(msg.as_string())
-            p.stdin.close()
-            if p.wait() != 0:
-                self.logger.error('Unable to deliver mail: %s' % p.stdout.read().strip())
-                return False
-        else:
-            # Send the message via SMTP to localhost:25
-            try:
-                smtp = SMTP(self.config.get('smtp'))
-                smtp.sendmail(sender, recipient, msg.as_string())
-            except Exception as e:
-                self.logger.error('Unable to deliver mail: %s' % e)
-                return False
-            else:
-                smtp.quit()
-
-        return True
+        self.delivery.put(sender, recipient, msg, callback)
+
+
+def test_scheduler():
+    class Options(object):
+        smtpd = None
+
+    class App(object):
+        options = Options()
+
+    scheduler = MonboobScheduler(App())
+    loop = threading.Thread(target=scheduler.run)
+    loop.daemon = True
+    loop.start()
+    try:
+        calls = []
+        done = threading.Event()
+        scheduler.schedule(0.3, calls.append, 'late')
+        canceled = scheduler.schedule(0.1, calls.append, 'canceled')
+        scheduler.schedule(0.1, calls.append, 'early')
+        repeated = scheduler.repeat(0.05, calls.append, 'repeated')
+        scheduler.schedule(0.4, done.set)
+        assert scheduler.cancel(canceled)
+        assert not scheduler.cancel(canceled)
+        assert done.wait(5)
+
+        assert 'canceled' not in calls
+        assert calls.index('early') < calls.index('late')
+        assert calls[0] == 'repeated'
+        assert calls.count('repeated') >= 3, calls
+
+        assert scheduler.cancel(repeated)
+        time.sleep(0.1)
+        count = calls.count('repeated')
+        time.sleep(0.2)
+        assert calls.count('repeated') == count
+
+        assert scheduler.dispatch(calls.append, 'dispatched').result(5) is None
+        assert calls[-1] == 'dispatched'
+    finally:
+        scheduler.want_stop()
+        loop.join(5)
+    assert not loop.is_alive()
+
+
+def test_delivery():
+    from smtpd import DebuggingServer
+    from weboob.tools.log import getLogger
+
+    class Server(DebuggingServer):
+        connections = 0
+        failures = 1
+
+        def handle_accept(self):
+            Server.connections += 1
+            DebuggingServer.handle_accept(self)
+
+        def process_message(self, peer, mailfrom, rcpttos, data):
+            if 'fail' in data and Server.failures > 0:
+                Server.failures -= 1
+                return '451 Try again later'
+            messages.append(message_from_string(data)['Subject'])
+
+    class App(object):
+        logger = getLogger('monboob')
+
+        def __init__(self, port):
+            self.config = {'pipe': '', 'smtp': '127.0.0.1:%d' % port}
+
+    messages = []
+    server = Server(('127.0.0.1', 0), None)
+    loop = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.05})
+    loop.daemon = True
+    loop.start()
+    try:
+        delivery = MailDelivery(App(server.socket.getsockname()[1]), workers=1, retries=1, backoff=0)
+        results = []
+        for subject in ('first', 'fail', 'last'):
+            msg = MIMEText('body')
+            msg['Subject'] = subject
+            delivery.put('sender@example.org', 'recipient@example.org', msg, results.append)
+        delivery.join()
+        assert results == [True, True, True], results
+        assert messages == ['first', 'fail', 'last'], messages
+        # The connection is closed after a failure, and reused otherwise.
+        assert Server.connections == 2, Server.connections
+
+        # Retries are exhausted.
+        Server.failures = 2
+        msg = MIMEText('body')
+        msg['Subject'] = 'fail again'
+        delivery.put('sender@example.org', 'recipient@example.org', msg, results.append)
+        delivery.stop()
+        assert results[-1] is False
+    finally:
+        server.close()
+    loop.join(5)
+
+    # A message is not delivered again while its delivery is pending.
+    class FakeWeboob(object):
+        def do(self, method):
+            return [message]
+
+    message = Message(Thread(u'42'), u'1', title=u'Subject', sender=u'sender', content=u'body')
+    message.backend = 'backend'
+    callbacks = []
+    app = Monboob.__new__(Monboob)
+    app.weboob = FakeWeboob()
+    app.pending = set()
+    app.pending_lock = threading.Lock()
+    app.send_email = lambda backend, mail, callback: callbacks.append(callback)
+    app.process()
+    app.process()
+    assert len(callbacks) == 1
+    callbacks[0](False)
+    app.process()
+    assert len(callbacks) == 2
@@ -30,6 +30,7 @@ from weboob.capabilities.base import empty
 from weboob.tools.application.repl import ReplApplication, defaultcount
 from weboob.tools.application.media_player import InvalidMediaPlayer, MediaPlayer, MediaPlayerNotFound
 from weboob.tools.application.formatters.iformatter import PrettyFormatter
+from weboob.tools.download import download_file
 
 __all__ = ['Radioob']
 
@@ -227,6 +228,9 @@ class Radioob(ReplApplication):
             if not check_exec('mimms'):
                 return 1
             args = ('mimms', '-r', audio.url, dest)
+        elif audio.url.startswith('http'):
+            browser = getattr(self.weboob[audio.backend], 'browser', None)
+            return download_file(audio.url, dest, browser, self.stdout, self.stderr, self.logger)
         else:
             if check_exec('wget'):
                 args = ('wget', '-c', audio.url, '-O', dest)
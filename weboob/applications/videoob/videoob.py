@@ -18,7 +18,6 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 from __future__ import print_function
-from urlparse import urlparse
 
 import requests
 import subprocess
@@ -29,6 +28,8 @@ from weboob.capabilities.base import empty
 from weboob.tools.application.repl import ReplApplication, defaultcount
 from weboob.tools.application.media_player import InvalidMediaPlayer, MediaPlayer, MediaPlayerNotFound
 from weboob.tools.application.formatters.iformatter import PrettyFormatter
+from weboob.tools.download import download_file
+from weboob.tools.hls import HLSDownloader, HLSError
 
 __all__ = ['Videoob']
 
@@ -102,16 +103,10 @@ class Videoob(ReplApplication):
         elif u'm3u8' == video.ext:
             _dest, _ = os.path.splitext(dest)
             dest = u'%s.%s' % (_dest, 'mp4')
-            content = tuple()
-            parsed_uri = urlparse(video.url)
-            baseurl = '{uri.scheme}://{uri.netloc}'.format(uri=parsed_uri)
-            for line in self.read_url(video.url):
-                if not line.startswith('#'):
-                    if not line.startswith('http'):
-                        line = u'%s%s' % (baseurl, line)
-                    content += (line,)
-
-            args = ('wget', '-nv',) + content + ('-O', dest)
+            return self.download_hls(video, dest)
+        elif video.url.startswith('http'):
+            browser = getattr(self.weboob[video.backend], 'browser', None)
+            return download_file(video.url, dest, browser, self.stdout, self.stderr, self.logger)
         else:
             if check_exec('wget'):
                 args = ('wget', '-c', video.url, '-O', dest)
@@ -123,9 +118,28 @@ class Videoob(ReplApplication):
         self.logger.debug(' '.join(args))
         os.spawnlp(os.P_WAIT, args[0], *args)
 
-    def read_url(self, url):
-        r = requests.get(url, stream=True)
-        return r.iter_lines()
+    def download_hls(self, video, dest):
+        def progress(done, total, size, elapsed):
+            if self.stdout.isatty():
+                print('\r%d/%d segments, %.1f MB, %.1f kB/s' %
+                      (done, total, size / 1048576., size / 1024. / max(elapsed, 0.001)),
+                      end='', file=self.stdout)
+                self.stdout.flush()
+
+        browser = getattr(self.weboob[video.backend], 'browser', None)
+        session = getattr(browser, 'session', None)
+        if not isinstance(session, requests.Session):
+            session = None
+
+        downloader = HLSDownloader(session, max_workers=4, progress=progress, logger=self.logger)
+        try:
+            size = downloader.download(video.url, dest)
+        except (HLSError, requests.exceptions.RequestException) as e:
+            print('', file=self.stdout)
+            print('Unable to download %s: %s' % (video.url, e), file=self.stderr)
+            return 1
+
+        print('\rDownloaded %s (%.1f MB)' % (dest, size / 1048576.), file=self.stdout)
 
     def complete_download(self, text, line, *ignored):
         args = line.split(' ')
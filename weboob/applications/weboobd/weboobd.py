@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+import os
+import signal
+import sys
+from optparse import OptionGroup
+
+from weboob.tools.application.base import Application
+from weboob.tools.application.daemon import ApplicationDaemon
+
+
+__all__ = ['Weboobd']
+
+
+class Weboobd(Application):
+    APPNAME = 'weboobd'
+    VERSION = '1.2'
+    COPYRIGHT = 'Copyright(C) 2016-YEAR weboob project'
+    DESCRIPTION = "Weboobd is a daemon keeping backends of console applications loaded. " \
+                  "When the WEBOOB_DAEMON environment variable is set to its socket, " \
+                  "commands of console applications are run by the daemon."
+    SHORT_DESCRIPTION = "run commands of console applications"
+
+    def __init__(self, option_parser=None):
+        super(Weboobd, self).__init__(option_parser)
+        options = OptionGroup(self._parser, 'Weboobd options')
+        options.add_option('-s', '--socket', help='path of the Unix socket (default: $WEBOOB_DAEMON, '
+                                                  'or weboobd.sock in the weboob directory)')
+        self._parser.add_option_group(options)
+
+    def main(self, argv):
+        path = self.options.socket or os.environ.get('WEBOOB_DAEMON') or \
+            os.path.join(self.weboob.workdir, 'weboobd.sock')
+
+        daemon = ApplicationDaemon(path, self.logger)
+        daemon.listen()
+        # Save browsers' state when killed.
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print('Listening on %s. Set WEBOOB_DAEMON=%s to use it.' % (path, path), file=self.stderr)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            daemon.close()
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import socket
+import ssl
+from threading import Lock
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import select_proxy
+
+try:
+    from h2.exceptions import NoSuchStreamError, ProtocolError
+    from hyper.common.bufsocket import BufferedSocket
+    from hyper.contrib import HTTP20Adapter
+    from hyper.http20.connection import HTTP20Connection
+    from hyper.http20.exceptions import ConnectionError as H2ConnectionError
+    from hyper.tls import H2_NPN_PROTOCOLS, init_context, wrap_socket
+except ImportError:
+    HTTP20Connection = None
+
+
+__all__ = ['HTTP2_AVAILABLE', 'HTTP2Adapter', 'create_adapter']
+
+
+HTTP2_AVAILABLE = HTTP20Connection is not None
+
+
+class HTTP11Required(Exception):
+    """
+    Raised when the server does not speak HTTP/2.
+    """
+
+
+def is_connection_error(error):
+    """
+    Tell if an error raised while sending a request on an HTTP/2 connection
+    makes the connection unusable, or only concerns the stream of the
+    request.
+    """
+    if isinstance(error, NoSuchStreamError):
+        return False
+    # Timeouts are connection errors too: no frame of any stream has been
+    # received for the whole timeout.
+    return isinstance(error, (socket.error, ssl.SSLError, H2ConnectionError, ProtocolError))
+
+
+def fix_h2_headers(response, resp):
+    """
+    Make the headers of a response built by :class:`hyper.contrib.HTTP20Adapter`
+    readable more than once.
+
+    cookielib reads them through ``response.raw._original_response.msg``,
+    which hyper fills with an iterator. This relies on the fake original
+    response built by hyper 0.7, so it is kept here.
+    """
+    response.raw._original_response.msg._headers = list(resp.headers.iter_raw())
+
+
+if HTTP2_AVAILABLE:
+    class H2Connection(HTTP20Connection):
+        """
+        HTTP/2 connection which fails without sending anything when the
+        server chooses HTTP/1.1 during the TLS handshake.
+
+        :param timeout: timeout of the connection, or a (connect, read)
+                        tuple
+        """
+
+        def __init__(self, host, port, ssl_context, timeout=None):
+            super(H2Connection, self).__init__(host, port, secure=True, ssl_context=ssl_context)
+            self.timeout = timeout
+
+        def connect(self):
+            with self._lock:
+                if self._sock is not None:
+                    return
+
+                if isinstance(self.timeout, tuple):
+                    connect_timeout, read_timeout = self.timeout
+                else:
+                    connect_timeout = read_timeout = self.timeout
+                sock = socket.create_connection((self.host, self.port), connect_timeout)
+                try:
+                    sock, proto = wrap_socket(sock, self.host, self.ssl_context)
+                    sock.settimeout(read_timeout)
+                except:
+                    sock.close()
+                    raise
+                if proto not in H2_NPN_PROTOCOLS:
+                    sock.close()
+                    raise HTTP11Required(proto)
+
+                self._sock = BufferedSocket(sock, self.network_buffer_size)
+                self._send_preamble()
+
+
+class HTTP2Adapter(HTTPAdapter):
+    """
+    Transport adapter sending requests to HTTPS servers over HTTP/2 when
+    they support it.
+
+    All requests to a server with the same timeout are multiplexed on one
+    connection, so concurrent requests (see
+    :meth:`weboob.browser.browsers.Browser.async_open`) don't need a
+    connection each. An error on a request only resets its stream, unless
+    the connection can't be used anymore. Servers which choose HTTP/1.1 during the
+    TLS handshake are remembered, and requests to them, plain HTTP requests
+    and requests sent through a proxy use the connection pools of
+    :class:`requests.adapters.HTTPAdapter`.
+
+    It requires the hyper package.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if not HTTP2_AVAILABLE:
+            raise ImportError('Please install python-hyper to use HTTP/2')
+        super(HTTP2Adapter, self).__init__(*args, **kwargs)
+        self.h2_connections = {}
+        self.h11_servers = set()
+        self.h2_lock = Lock()
+        self.h2_builder = HTTP20Adapter()
+
+    def init_ssl_context(self, verify, cert):
+        if isinstance(verify, basestring):
+            context = init_context(cert_path=verify, cert=cert)
+        else:
+            context = init_context(cert=cert)
+        if not verify:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+    def get_h2_key(self, url, verify, cert, timeout):
+        parsed = urlparse(url)
+        # The timeout is the one of the socket, which is shared by the
+        # streams of the connection.
+        return (parsed.hostname, parsed.port or 443, verify, cert, timeout)
+
+    def get_h2_connection(self, key):
+        """
+        Get the HTTP/2 connection to a server, opening it if needed.
+
+        :param key: key given by :meth:`get_h2_key`
+        :returns: the connection, or None if the server only speaks HTTP/1.1
+        """
+        host, port, verify, cert, timeout = key
+        with self.h2_lock:
+            if key[:4] in self.h11_servers:
+                return None
+            conn = self.h2_connections.get(key)
+            if conn is None:
+                conn = H2Connection(host, port, self.init_ssl_context(verify, cert), timeout)
+                self.h2_connections[key] = conn
+
+        try:
+            conn.connect()
+        except HTTP11Required:
+            with self.h2_lock:
+                self.h11_servers.add(key[:4])
+                self.h2_connections.pop(key, None)
+            return None
+        except (socket.error, ssl.SSLError) as e:
+            self.drop_h2_connection(key, conn)
+            raise requests.ConnectionError(e)
+        return conn
+
+    def drop_h2_connection(self, key, conn):
+        with self.h2_lock:
+            if self.h2_connections.get(key) is conn:
+                del self.h2_connections[key]
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def reset_h2_stream(self, key, conn, stream_id):
+        """
+        Cancel the stream of a failed request, keeping the other streams of
+        the connection.
+        """
+        stream = conn.streams.get(stream_id)
+        if stream is None:
+            # Already reset by the server.
+            return
+        try:
+            stream.close(error_code=8)  # CANCEL
+        except Exception as e:
+            if is_connection_error(e):
+                self.drop_h2_connection(key, conn)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if not request.url.startswith('https://') or select_proxy(request.url, proxies):
+            return super(HTTP2Adapter, self).send(request, stream, timeout, verify, cert, proxies)
+
+        if isinstance(cert, list):
+            cert = tuple(cert)
+
+        key = self.get_h2_key(request.url, verify, cert, timeout)
+        conn = self.get_h2_connection(key)
+        if conn is None:
+            return super(HTTP2Adapter, self).send(request, stream, timeout, verify, cert, proxies)
+
+        parsed = urlparse(request.url)
+        selector = parsed.path or '/'
+        if parsed.query:
+            selector += '?' + parsed.query
+
+        stream_id = None
+        try:
+            stream_id = conn.request(request.method, selector, request.body, request.headers)
+            resp = conn.get_response(stream_id)
+            response = self.h2_builder.build_response(request, resp)
+            fix_h2_headers(response, resp)
+            if not stream:
+                response.content
+        except Exception as e:
+            if is_connection_error(e) or stream_id is None:
+                # The request may have been partially sent, so the next
+                # request will open a new connection.
+                self.drop_h2_connection(key, conn)
+            else:
+                self.reset_h2_stream(key, conn, stream_id)
+            if isinstance(e, requests.RequestException):
+                raise
+            # Python 2 raises SSLError on timeouts of SSL sockets, and urllib3
+            # detects them the same way.
+            if isinstance(e, socket.timeout) or isinstance(e, ssl.SSLError) and 'timed out' in str(e):
+                raise requests.Timeout(e, request=request)
+            raise requests.ConnectionError(e, request=request)
+
+        response.connection = self
+        return response
+
+    def close(self):
+        super(HTTP2Adapter, self).close()
+        with self.h2_lock:
+            connections = self.h2_connections.values()
+            self.h2_connections.clear()
+        for conn in connections:
+            conn.close()
+
+
+def create_adapter(http2=False, **kwargs):
+    """
+    Create a transport adapter for a python-requests session.
+
+    :param http2: use HTTP/2 with servers supporting it, if hyper is
+                  installed
+    :type http2: bool
+    :param kwargs: arguments of :class:`requests.adapters.HTTPAdapter`
+    :rtype: :class:`requests.adapters.HTTPAdapter`
+    """
+    if http2 and HTTP2_AVAILABLE:
+        return HTTP2Adapter(**kwargs)
+    return HTTPAdapter(**kwargs)
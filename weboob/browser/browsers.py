@@ -33,6 +33,7 @@ except ImportError:
     from urlparse import urlparse, urljoin
 import os
 import sys
+import time
 from copy import deepcopy
 import inspect
 
@@ -45,10 +46,12 @@ except ImportError:
 
 from weboob.exceptions import BrowserHTTPSDowngrade
 
+from weboob.tools.limit import get_limit
 from weboob.tools.log import getLogger
 from weboob.tools.ordereddict import OrderedDict
 from weboob.tools.json import json
 
+from .adapters import create_adapter
 from .cookies import WeboobCookieJar
 from .exceptions import HTTPNotFound, ClientError, ServerError
 from .sessions import FuturesSession
@@ -93,11 +96,31 @@ class Browser(object):
     Maximum of threads for asynchronous requests.
     """
 
+    HTTP2 = False
+    """
+    Send requests to HTTPS servers supporting it over HTTP/2, with
+    concurrent requests sharing one connection. It requires the hyper
+    package, otherwise HTTP/1.1 is used.
+    """
+
     ALLOW_REFERRER = True
     """
     Controls the behavior of get_referrer.
     """
 
+    RATE_LIMIT = None
+    """
+    Maximum number of requests per second to a host, shared by every
+    browser of the process which sets it (like backends of a module), or
+    None for no limit.
+    """
+
+    RATE_LIMIT_BURST = 1
+    """
+    Number of requests to a host which can be sent without waiting after
+    a pause, when :attr:`RATE_LIMIT` is set.
+    """
+
     @classmethod
     def asset(cls, localfile):
         """
@@ -180,6 +203,14 @@ class Browser(object):
     def _create_session(self):
         return FuturesSession(max_workers=self.MAX_WORKERS, max_retries=self.MAX_RETRIES)
 
+    def _create_adapter(self, **kwargs):
+        """
+        Create the transport adapter used to send requests.
+
+        :param kwargs: arguments of :class:`requests.adapters.HTTPAdapter`
+        """
+        return create_adapter(self.HTTP2, **kwargs)
+
     def _setup_session(self, profile):
         """
         Set up a python-requests session for our usage.
@@ -203,11 +234,13 @@ class Browser(object):
         if self.MAX_WORKERS > requests.adapters.DEFAULT_POOLSIZE:
             adapter_kwargs.update(pool_connections=self.MAX_WORKERS,
                                   pool_maxsize=self.MAX_WORKERS)
-        session.mount('https://', requests.adapters.HTTPAdapter(**adapter_kwargs))
-        session.mount('http://', requests.adapters.HTTPAdapter(**adapter_kwargs))
+        session.mount('https://', self._create_adapter(**adapter_kwargs))
+        session.mount('http://', self._create_adapter(**adapter_kwargs))
 
         if self.TIMEOUT:
             session.timeout = self.TIMEOUT
+        session.rate_limit = self.RATE_LIMIT
+        session.rate_limit_burst = self.RATE_LIMIT_BURST
         ## weboob only can provide proxy and HTTP auth options
         session.trust_env = False
 
@@ -710,6 +743,9 @@ class PagesBrowser(DomainBrowser):
 
         :class:`NextPage` constructor can take an url or a Request object.
 
+        The next page is not loaded when the consumer already got the number of
+        results it wants (see :func:`weboob.tools.limit.limit_results`).
+
         >>> from .pages import HTMLPage
         >>> class Page(HTMLPage):
         ...     def iter_values(self):
@@ -733,6 +769,8 @@ class PagesBrowser(DomainBrowser):
                 for r in func(*args, **kwargs):
                     yield r
             except NextPage as e:
+                if not get_limit().can_continue():
+                    return
                 self.location(e.request)
             else:
                 return
@@ -787,10 +825,27 @@ class StatesMixin(object):
     Saved state variables.
     """
 
+    STATE_DURATION = None
+    """
+    In minutes, time after which the session on the website has expired,
+    so cookies and location are not restored anymore. None to always
+    restore them, as long as cookies are not expired.
+    """
+
+    STATE_PROBE = None
+    """
+    URL of a cheap page to load to resume a session, instead of the last
+    location. It has to match a page telling if the user is logged.
+    """
+
     def load_state(self, state):
+        if 'expire' in state and state['expire'] < time.time():
+            self.logger.info('Session has expired, cookies are not restored')
+            state = dict((attrname, state[attrname]) for attrname in self.__states__ if attrname in state)
+
         if 'cookies' in state:
             try:
-                self.session.cookies = pickle.loads(zlib.decompress(base64.b64decode(state['cookies'])))
+                self.load_cookies(state['cookies'])
             except (TypeError, zlib.error, EOFError, ValueError):
                 self.logger.error('Unable to reload cookies from storage')
             else:
@@ -799,17 +854,62 @@ class StatesMixin(object):
             if attrname in state:
                 setattr(self, attrname, state[attrname])
 
-        if 'url' in state:
+        if 'url' in state and len(self.session.cookies):
             try:
-                self.location(state['url'])
+                self.location(self.STATE_PROBE or state['url'])
             except (requests.exceptions.HTTPError, requests.exceptions.TooManyRedirects):
                 pass
 
+    def load_cookies(self, cookies):
+        """
+        Load cookies stored by :meth:`dump_state`. Expired cookies are
+        ignored.
+        """
+        if isinstance(cookies, basestring):
+            # Format of older versions.
+            self.session.cookies = pickle.loads(zlib.decompress(base64.b64decode(cookies)))
+            return
+
+        now = time.time()
+        jar = WeboobCookieJar()
+        for attrs in cookies:
+            if not isinstance(attrs, dict):
+                # Format of older versions.
+                attrs = dict(zip(('name', 'value', 'domain', 'path', 'expires', 'secure'), attrs))
+            attrs = attrs.copy()
+            if attrs['expires'] is not None and attrs['expires'] <= now:
+                continue
+
+            # create_cookie() deduces these flags from the domain and the
+            # path, so host-only cookies would become domain cookies.
+            specified = dict((key, attrs.pop(key)) for key in ('domain_specified', 'domain_initial_dot',
+                                                                'path_specified') if key in attrs)
+            cookie = requests.cookies.create_cookie(attrs.pop('name'), attrs.pop('value'), **attrs)
+            for key, value in specified.items():
+                setattr(cookie, key, value)
+            jar.set_cookie(cookie)
+        self.session.cookies = jar
+
+    def dump_cookies(self):
+        """
+        Get cookies as a list of dicts of their attributes, without expired
+        cookies.
+        """
+        now = time.time()
+        keys = ('name', 'value', 'domain', 'path', 'expires', 'secure', 'port',
+                'domain_specified', 'domain_initial_dot', 'path_specified')
+        # Non-standard attributes, like HttpOnly, have no public accessor.
+        return [dict([(key, getattr(cookie, key)) for key in keys] + [('rest', cookie._rest)])
+                for cookie in self.session.cookies
+                if cookie.expires is None or cookie.expires > now]
+
     def dump_state(self):
         state = {}
         if self.page:
             state['url'] = self.page.url
-        state['cookies'] = base64.b64encode(zlib.compress(pickle.dumps(self.session.cookies, -1)))
+        state['cookies'] = self.dump_cookies()
+        if self.STATE_DURATION is not None:
+            state['expire'] = int(time.time() + self.STATE_DURATION * 60)
         for attrname in self.__states__:
             state[attrname] = getattr(self, attrname)
         self.logger.info('Stored cookies into storage')
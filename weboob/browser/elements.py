@@ -112,6 +112,13 @@ class ListElement(AbstractElement):
     item_xpath = None
     flush_at_end = False
     ignore_duplicate = False
+    lazy = False
+    """
+    If True, elements are processed while objects are yielded, instead of
+    before, and objects are not kept. Use it to iterate on large documents,
+    like :class:`weboob.browser.pages.XLSPage` with ON_DEMAND, with constant
+    memory. It can't be used with flush_at_end.
+    """
 
     def __init__(self, *args, **kwargs):
         super(ListElement, self).__init__(*args, **kwargs)
@@ -142,17 +149,10 @@ class ListElement(AbstractElement):
 
         self.parse(self.el)
 
-        items = []
-        for el in self.find_elements():
-            for attrname in dir(self):
-                attr = getattr(self, attrname)
-                if isinstance(attr, type) and issubclass(attr, AbstractElement) and attr != type(self):
-                    item = attr(self.page, self, el)
-                    if item.condition is not None and not item.condition():
-                        continue
-
-                    item.handle_loaders()
-                    items.append(item)
+        assert not (self.lazy and self.flush_at_end), 'lazy lists can not be flushed at end'
+        items = self.iter_items()
+        if not self.lazy:
+            items = list(items)
 
         for item in items:
             for obj in item:
@@ -166,6 +166,22 @@ class ListElement(AbstractElement):
 
         self.check_next_page()
 
+    def iter_items(self):
+        klasses = []
+        for attrname in dir(self):
+            attr = getattr(self, attrname)
+            if isinstance(attr, type) and issubclass(attr, AbstractElement) and attr != type(self):
+                klasses.append(attr)
+
+        for el in self.find_elements():
+            for klass in klasses:
+                item = klass(self.page, self, el)
+                if item.condition is not None and not item.condition():
+                    continue
+
+                item.handle_loaders()
+                yield item
+
     def flush(self):
         for obj in self.objects.itervalues():
             yield obj
@@ -194,7 +210,8 @@ class ListElement(AbstractElement):
                     return
                 else:
                     raise DataError('There are two objects with the same ID! %s' % obj.id)
-            self.objects[obj.id] = obj
+            # Only IDs are needed to find duplicates of lazy lists.
+            self.objects[obj.id] = None if self.lazy else obj
         return obj
 
 
@@ -32,6 +32,7 @@ import requests
 
 from weboob.exceptions import ParseError
 from weboob.tools.compat import basestring
+from weboob.tools.limit import get_limit
 from weboob.tools.log import getLogger
 from weboob.tools.ordereddict import OrderedDict
 from weboob.tools.pdf import decompress_pdf
@@ -46,6 +47,9 @@ def pagination(func):
 
     :class:`NextPage` constructor can take an url or a Request object.
 
+    The next page is not loaded when the consumer already got the number of
+    results it wants (see :func:`weboob.tools.limit.limit_results`).
+
     >>> class Page(HTMLPage):
     ...     @pagination
     ...     def iter_values(self):
@@ -72,6 +76,8 @@ def pagination(func):
                 for r in func(page, *args, **kwargs):
                     yield r
             except NextPage as e:
+                if not get_limit().can_continue():
+                    return
                 result = page.browser.location(e.request)
                 page = result.page
             else:
@@ -433,6 +439,34 @@ class JsonPage(Page):
         return json.loads(text)
 
 
+class XLSRows(object):
+    """
+    Rows of a worksheet, built when they are iterated.
+
+    :param sheet: worksheet
+    :type sheet: :class:`xlrd.sheet.Sheet`
+    :param header: index of the header line, or None
+    :type header: int
+    """
+
+    def __init__(self, sheet, header=None):
+        self.sheet = sheet
+        self.header = header
+
+    def __iter__(self):
+        header = None
+        for i in range(self.sheet.nrows - 1):
+            if self.header and i + 1 < self.header:
+                continue
+            row = self.sheet.row_values(i)
+            if header is None and self.header:
+                header = [s.replace('/', '') for s in row]
+            elif header:
+                yield dict(zip(header, row))
+            else:
+                yield row
+
+
 class XLSPage(Page):
     """
     XLS Page.
@@ -448,6 +482,12 @@ class XLSPage(Page):
     Specify the index of the worksheet to use.
     """
 
+    ON_DEMAND = False
+    """
+    If True, only the worksheet in use is loaded, and the document is an
+    iterable building rows when they are read, instead of a list.
+    """
+
     def build_doc(self, content):
         return self.parse(content)
 
@@ -456,26 +496,15 @@ class XLSPage(Page):
         Method called by the constructor of :class:`XLSPage` to parse the document.
         """
         import xlrd
-        wb = xlrd.open_workbook(file_contents=data)
+        wb = xlrd.open_workbook(file_contents=data, on_demand=self.ON_DEMAND)
         sh = wb.sheet_by_index(self.SHEET_INDEX)
 
-        header = None
-        drows = []
-        rows = []
-        for i in range(sh.nrows - 1):
-            if self.HEADER and i + 1 < self.HEADER:
-                continue
-            row = sh.row_values(i)
-            if header is None and self.HEADER:
-                header = map(lambda s: s.replace('/', ''), row)
-            else:
-                rows.append(row)
-                if header:
-                    drow = {}
-                    for i, cell in enumerate(sh.row_values(i)):
-                        drow[header[i]] = cell
-                    drows.append(drow)
-        return drows if header is not None else rows
+        rows = XLSRows(sh, self.HEADER)
+        if self.ON_DEMAND:
+            # The sheet is loaded, other ones are not needed.
+            wb.release_resources()
+            return rows
+        return list(rows)
 
 
 class XMLPage(Page):
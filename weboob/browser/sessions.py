@@ -25,6 +25,11 @@ try:
 except ImportError:
     ThreadPoolExecutor = None
 
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
 from requests import Session
 from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from requests.compat import cookielib, OrderedDict
@@ -34,6 +39,8 @@ from requests.sessions import merge_setting
 from requests.structures import CaseInsensitiveDict
 from requests.utils import get_netrc_auth
 
+from weboob.tools.ratelimit import wait_host
+
 
 def merge_hooks(request_hooks, session_hooks, dict_class=OrderedDict):
     """
@@ -59,6 +66,21 @@ def merge_hooks(request_hooks, session_hooks, dict_class=OrderedDict):
 
 
 class WeboobSession(Session):
+    rate_limit = None
+    """
+    Maximum number of requests per second to a host, shared by the
+    process (see :func:`weboob.tools.ratelimit.wait_host`), or None.
+    """
+
+    rate_limit_burst = 1
+
+    def send(self, request, **kwargs):
+        # Redirections are sent through this method too, so they are also
+        # counted.
+        if self.rate_limit:
+            wait_host(urlparse(request.url).hostname, self.rate_limit, self.rate_limit_burst)
+        return super(WeboobSession, self).send(request, **kwargs)
+
     def prepare_request(self, request):
         """Constructs a :class:`PreparedRequest <PreparedRequest>` for
         transmission and returns it. The :class:`PreparedRequest` has settings
@@ -132,7 +154,7 @@ class FuturesSession(WeboobSession):
         Used by :meth:`request` and thus all of the higher level methods
 
         If the `is_async` param is True, the request is processed in a
-        thread. Otherwise, the request is processed as usual, in a blocking way.
+        thread, including the wait for the rate limit. Otherwise, the request is processed as usual, in a blocking way.
 
         In all cases, it will call the `callback` parameter and return its
         result when the request has been processed.
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler
+from unittest import TestCase
+
+import requests
+from nose.plugins.skip import SkipTest
+from requests.adapters import HTTPAdapter
+
+from weboob.browser import Browser
+from weboob.browser.adapters import HTTP2_AVAILABLE, HTTP2Adapter
+
+
+class HTTP11Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = 'HTTP/1.1 %s' % self.path
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TLSServer(object):
+    """
+    HTTPS server speaking HTTP/2 or HTTP/1.1, as chosen with ALPN.
+
+    On HTTP/2 connections, the first responses are only sent once
+    `wait_streams` requests have been received, to check they are
+    multiplexed. Streams of /reset requests are reset, and /slow requests
+    get no response.
+    """
+
+    def __init__(self, certfile, protocols, wait_streams=1):
+        self.context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        self.context.load_cert_chain(certfile)
+        self.context.set_alpn_protocols(protocols)
+        self.wait_streams = wait_streams
+        self.connections = 0
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                sock, addr = self.sock.accept()
+            except socket.error:
+                return
+            self.connections += 1
+            thread = threading.Thread(target=self.handle, args=(sock, addr))
+            thread.daemon = True
+            thread.start()
+
+    def handle(self, sock, addr):
+        try:
+            sock = self.context.wrap_socket(sock, server_side=True)
+            if sock.selected_alpn_protocol() == 'h2':
+                self.handle_h2(sock)
+            else:
+                HTTP11Handler(sock, addr, self)
+        except (socket.error, ssl.SSLError):
+            pass
+        finally:
+            sock.close()
+
+    def handle_h2(self, sock):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.events import RequestReceived
+
+        conn = H2Connection(config=H2Configuration(client_side=False))
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+        pending = []
+        wait_streams = self.wait_streams
+        while True:
+            data = sock.recv(65535)
+            if not data:
+                return
+            for event in conn.receive_data(data):
+                if isinstance(event, RequestReceived):
+                    pending.append((event.stream_id, dict(event.headers)[':path']))
+            if len(pending) >= wait_streams:
+                for stream_id, path in pending:
+                    if path == '/reset':
+                        conn.reset_stream(stream_id)
+                        continue
+                    if path == '/slow':
+                        continue
+                    body = str('HTTP/2 %s with %d streams' % (path, len(pending)))
+                    conn.send_headers(stream_id, [(':status', '200'),
+                                                  ('content-type', 'text/plain'),
+                                                  ('content-length', str(len(body))),
+                                                  ('set-cookie', 'protocol=h2; Path=/')])
+                    conn.send_data(stream_id, body, end_stream=True)
+                pending = []
+                wait_streams = 1
+            sock.sendall(conn.data_to_send())
+
+    def close(self):
+        self.sock.close()
+
+
+class HTTP2Browser(Browser):
+    HTTP2 = True
+    VERIFY = False
+    MAX_WORKERS = 4
+    TIMEOUT = 5
+
+
+class AdaptersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if not HTTP2_AVAILABLE:
+            raise SkipTest('hyper is not installed')
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.certfile = os.path.join(cls.tmpdir, 'cert.pem')
+        try:
+            subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                                   '-subj', '/CN=localhost', '-keyout', cls.certfile, '-out', cls.certfile],
+                                  stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+        except OSError:
+            shutil.rmtree(cls.tmpdir)
+            raise SkipTest('openssl is not installed')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_adapter(self):
+        browser = Browser()
+        self.assertIs(type(browser.session.get_adapter('https://weboob.org')), HTTPAdapter)
+        browser = HTTP2Browser()
+        self.assertIsInstance(browser.session.get_adapter('https://weboob.org'), HTTP2Adapter)
+
+    def test_multiplexing(self):
+        server = TLSServer(self.certfile, ['h2', 'http/1.1'], wait_streams=4)
+        try:
+            browser = HTTP2Browser()
+            url = 'https://127.0.0.1:%d' % server.port
+            futures = [browser.async_open('%s/page%d' % (url, i)) for i in range(4)]
+            texts = [future.result(timeout=10).text for future in futures]
+            self.assertEqual(texts, ['HTTP/2 /page%d with 4 streams' % i for i in range(4)])
+            self.assertEqual(browser.open(url + '/next').headers['Content-Type'], 'text/plain')
+            self.assertEqual(server.connections, 1)
+            self.assertEqual(browser.session.cookies.get('protocol'), 'h2')
+            browser.session.close()
+        finally:
+            server.close()
+
+    def test_http11_fallback(self):
+        server = TLSServer(self.certfile, ['http/1.1'])
+        try:
+            browser = HTTP2Browser()
+            url = 'https://127.0.0.1:%d' % server.port
+            for i in range(3):
+                self.assertEqual(browser.open('%s/page%d' % (url, i)).text, 'HTTP/1.1 /page%d' % i)
+            # One connection was used to find that the server only speaks
+            # HTTP/1.1, then the connection of the pool was reused.
+            self.assertEqual(server.connections, 2)
+            browser.session.close()
+        finally:
+            server.close()
+
+    def test_stream_reset(self):
+        server = TLSServer(self.certfile, ['h2', 'http/1.1'], wait_streams=3)
+        try:
+            browser = HTTP2Browser()
+            url = 'https://127.0.0.1:%d' % server.port
+            futures = [browser.async_open(url + path) for path in ('/page0', '/reset', '/page1')]
+            self.assertEqual(futures[0].result(timeout=10).text, 'HTTP/2 /page0 with 3 streams')
+            self.assertRaises(requests.ConnectionError, futures[1].result, timeout=10)
+            self.assertEqual(futures[2].result(timeout=10).text, 'HTTP/2 /page1 with 3 streams')
+            # The other streams and the next requests use the same connection.
+            self.assertEqual(browser.open(url + '/next').text, 'HTTP/2 /next with 1 streams')
+            self.assertEqual(server.connections, 1)
+            browser.session.close()
+        finally:
+            server.close()
+
+    def test_timeout(self):
+        server = TLSServer(self.certfile, ['h2', 'http/1.1'])
+        try:
+            browser = HTTP2Browser()
+            url = 'https://127.0.0.1:%d' % server.port
+            self.assertEqual(browser.open(url + '/page').text, 'HTTP/2 /page with 1 streams')
+            start = time.time()
+            self.assertRaises(requests.Timeout, browser.open, url + '/slow', timeout=0.5)
+            self.assertLess(time.time() - start, HTTP2Browser.TIMEOUT)
+            # Requests with another timeout use another connection.
+            self.assertEqual(server.connections, 2)
+            self.assertEqual(browser.open(url + '/next').text, 'HTTP/2 /next with 1 streams')
+            self.assertEqual(server.connections, 2)
+            browser.session.close()
+        finally:
+            server.close()
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import urllib2
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from unittest import TestCase
+
+from nose.plugins.skip import SkipTest
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections.append(self.client_address)
+
+    def do_GET(self):
+        if self.path == '/login':
+            self.send_response(302)
+            self.send_header('Location', '/page')
+            self.send_header('Set-Cookie', 'session=42; Path=/')
+            body = ''
+        else:
+            body = 'path=%s cookie=%s' % (self.path, self.headers.get('Cookie'))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, certfile=None, keyfile=None):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.connections = []
+        if certfile is not None:
+            # With TLS 1.3, session tickets sent after the handshake could make
+            # the pooled connection look dropped before it is reused.
+            self.socket = ssl.wrap_socket(self.socket, keyfile, certfile, server_side=True,
+                                          ssl_version=ssl.PROTOCOL_TLSv1_2)
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def handle_error(self, request, client_address):
+        # Connections closed by the browser without sending a request.
+        pass
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TransportTest(TestCase):
+    def setUp(self):
+        try:
+            import mechanize
+            from weboob.deprecated.browser import transport
+        except ImportError as e:
+            raise SkipTest('deprecated browsers are not available: %s' % e)
+        self.mechanize = mechanize
+        self.transport = transport
+        self.server = Server()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_port
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_session_handlers(self):
+        browser = self.mechanize.Browser()
+        browser.set_handle_robots(False)
+        session = self.transport.create_session()
+        self.transport.install_session_handlers(browser, session)
+        self.assertEqual(browser.open(self.url + '/login').read(), 'path=/page cookie=session=42')
+        response = browser.open(self.url + '/other')
+        self.assertEqual(response.geturl(), self.url + '/other')
+        self.assertEqual(response.info().get('Content-Type'), 'text/plain')
+        self.assertEqual(response.read(), 'path=/other cookie=session=42')
+        # Both requests and the redirection used the same connection.
+        self.assertEqual(len(self.server.connections), 1)
+        session.close()
+
+    def test_rate_limit(self):
+        from weboob.deprecated.browser.browser import RateLimitHandler
+
+        browser = self.mechanize.Browser()
+        browser.set_handle_robots(False)
+        browser.add_handler(RateLimitHandler(4))
+        browser.open(self.url + '/page')
+        start = time.time()
+        self.assertEqual(browser.open(self.url + '/login').read(), 'path=/page cookie=session=42')
+        # Both requests of the redirection are limited.
+        self.assertGreater(time.time() - start, 0.45)
+
+
+class CerthashTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            from weboob.deprecated.browser import browser
+        except ImportError as e:
+            raise SkipTest('deprecated browsers are not available: %s' % e)
+        cls.browser = browser
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.certfile = os.path.join(cls.tmpdir, 'cert.pem')
+        cls.keyfile = os.path.join(cls.tmpdir, 'key.pem')
+        try:
+            subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                                   '-subj', '/CN=localhost', '-keyout', cls.keyfile, '-out', cls.certfile],
+                                  stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+        except OSError:
+            shutil.rmtree(cls.tmpdir)
+            raise SkipTest('openssl is not installed')
+        with open(cls.certfile) as f:
+            cls.certhash = hashlib.sha256(ssl.DER_cert_to_PEM_cert(ssl.PEM_cert_to_DER_cert(f.read()))).hexdigest()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        class PooledBrowser(self.browser.StandardBrowser):
+            POOLED_TRANSPORT = True
+
+            def _probe_certhash(self, domain, port=443):
+                # Certificate given on a connection without SNI.
+                self.probes.append((domain, port))
+                return 'nosni'
+
+        self.server = Server(self.certfile, self.keyfile)
+        self.key = ('127.0.0.1', self.server.server_port)
+        self.b = PooledBrowser()
+        self.b.probes = []
+        self.browser.cacheCerthash.pop(self.key, None)
+
+    def tearDown(self):
+        self.b.session.close()
+        self.server.close()
+        self.browser.cacheCerthash.pop(self.key, None)
+
+    def test_cache(self):
+        self.assertEqual(self.b._certhash(*self.key), self.certhash)
+        self.browser.cacheCerthash[self.key] = 'cached', self.browser.cacheCerthash[self.key][1]
+        self.assertEqual(self.b._certhash(*self.key), 'cached')
+        self.b.CERTHASH_TTL = 0
+        self.assertEqual(self.b._certhash(*self.key), self.certhash)
+        # The connection used to get the certificate was kept by the session.
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.b.probes, [])
+
+    def test_mismatch(self):
+        domain, port = self.key
+        # A cached hash of a renewed certificate is checked again on a new
+        # connection.
+        self.browser.cacheCerthash[self.key] = 'renewed', time.time()
+        self.b.lowsslcheck(domain, self.certhash, port)
+        self.assertEqual(self.browser.cacheCerthash[self.key][0], self.certhash)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.b.probes, [])
+        self.assertRaises(self.browser.BrowserSSLError, self.b.lowsslcheck, domain, ['other'], port)
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertEqual(self.b.probes, [self.key])
+        # The connection is still usable.
+        self.assertEqual(self.b.open('https://%s:%d/page' % self.key).read(), 'path=/page cookie=None')
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_nosni(self):
+        domain, port = self.key
+        self.b.lowsslcheck(domain, ['nosni'], port)
+        self.assertEqual(self.browser.cacheCerthash[self.key][0], 'nosni')
+        self.b.lowsslcheck(domain, ['nosni'], port)
+        # The second check used the cached hash.
+        self.assertEqual(self.b.probes, [self.key])
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_unknown_pool(self):
+        class Pool(object):
+            pass
+
+        adapter = self.b.session.get_adapter('https://%s:%d/' % self.key)
+        adapter.get_connection = lambda url, proxies=None: Pool()
+        self.assertRaises(urllib2.URLError, self.b.lowsslcheck, self.key[0], self.certhash, self.key[1])
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from unittest import TestCase
+
+from weboob.browser import Browser
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.times.append(time.time())
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/page')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(self.path)))
+        self.end_headers()
+        self.wfile.write(self.path)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LimitedBrowser(Browser):
+    RATE_LIMIT = 4
+    MAX_WORKERS = 4
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        self.server = Server(('localhost', 0), Handler)
+        self.server.times = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://localhost:%d' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_async(self):
+        browser = LimitedBrowser()
+        start = time.time()
+        futures = [browser.async_open('%s/page%d' % (self.url, i)) for i in range(4)]
+        # Requests wait for the rate limit in the threads of the session.
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(sorted(future.result(timeout=10).text for future in futures),
+                         ['/page%d' % i for i in range(4)])
+        times = sorted(self.server.times)
+        self.assertGreater(times[-1] - times[0], 0.7)
+        browser.deinit()
+
+    def test_redirect(self):
+        browser = LimitedBrowser()
+        browser.open(self.url + '/page')
+        start = time.time()
+        self.assertEqual(browser.open(self.url + '/redirect').text, '/page')
+        # Both requests of the redirection are limited.
+        self.assertGreater(time.time() - start, 0.45)
+        browser.deinit()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import base64
+import pickle
+import time
+import zlib
+from unittest import TestCase
+
+from requests.cookies import create_cookie
+
+from weboob.browser import PagesBrowser
+from weboob.browser.browsers import StatesMixin
+
+
+class MyStatesBrowser(PagesBrowser, StatesMixin):
+    BASEURL = 'http://weboob.org'
+    STATE_DURATION = 10
+
+    __states__ = ('token',)
+
+    def __init__(self, *args, **kwargs):
+        super(MyStatesBrowser, self).__init__(*args, **kwargs)
+        self.token = None
+        self.locations = []
+
+    def location(self, url, **kwargs):
+        # Do not go on the website.
+        self.locations.append(url)
+
+
+class MyProbeStatesBrowser(MyStatesBrowser):
+    STATE_PROBE = '/keepalive'
+
+
+class StatesTest(TestCase):
+    def setUp(self):
+        browser = MyStatesBrowser()
+        browser.session.cookies.set_cookie(create_cookie('session', 'foo', domain='weboob.org'))
+        browser.session.cookies.set_cookie(create_cookie('old', 'bar', domain='weboob.org',
+                                                         expires=int(time.time()) - 1))
+        browser.token = 'secret'
+        self.state = browser.dump_state()
+        self.state['url'] = 'http://weboob.org/accounts'
+
+    def test_dump(self):
+        self.assertEqual(self.state['cookies'], [{'name': 'session', 'value': 'foo', 'domain': 'weboob.org',
+                                                  'path': '/', 'expires': None, 'secure': False, 'port': None,
+                                                  'rest': {'HttpOnly': None}, 'domain_specified': True,
+                                                  'domain_initial_dot': False, 'path_specified': True}])
+        self.assertEqual(self.state['token'], 'secret')
+        self.assertGreater(self.state['expire'], time.time())
+
+    def test_load(self):
+        browser = MyStatesBrowser()
+        browser.load_state(self.state)
+        self.assertEqual(browser.session.cookies.get('session'), 'foo')
+        self.assertEqual(browser.token, 'secret')
+        self.assertEqual(browser.locations, ['http://weboob.org/accounts'])
+
+    def test_load_host_only(self):
+        browser = MyStatesBrowser()
+        # Cookie set without a domain attribute by a response of
+        # weboob.org:8080.
+        cookie = create_cookie('session', 'foo', domain='weboob.org', port='8080', rest={'HttpOnly': None})
+        cookie.domain_specified = False
+        browser.session.cookies.set_cookie(cookie)
+        cookies = browser.dump_cookies()
+
+        browser = MyStatesBrowser()
+        browser.load_cookies(cookies)
+        cookie, = browser.session.cookies
+        self.assertEqual((cookie.name, cookie.value, cookie.domain, cookie.port),
+                         ('session', 'foo', 'weboob.org', '8080'))
+        self.assertFalse(cookie.domain_specified)
+        self.assertTrue(cookie.port_specified)
+        self.assertTrue(cookie.has_nonstandard_attr('HttpOnly'))
+
+    def test_load_list_format(self):
+        browser = MyStatesBrowser()
+        browser.load_cookies([['session', 'foo', 'weboob.org', '/', None, False],
+                              ['old', 'bar', 'weboob.org', '/', int(time.time()) - 1, False]])
+        cookie, = browser.session.cookies
+        self.assertEqual((cookie.name, cookie.value, cookie.domain), ('session', 'foo', 'weboob.org'))
+        self.assertTrue(cookie.domain_specified)
+
+    def test_load_probe(self):
+        browser = MyProbeStatesBrowser()
+        browser.load_state(self.state)
+        self.assertEqual(browser.locations, ['/keepalive'])
+
+    def test_load_expired(self):
+        self.state['expire'] = time.time() - 1
+        browser = MyStatesBrowser()
+        browser.load_state(self.state)
+        self.assertEqual(len(browser.session.cookies), 0)
+        self.assertEqual(browser.token, 'secret')
+        self.assertEqual(browser.locations, [])
+
+    def test_load_old_format(self):
+        browser = MyStatesBrowser()
+        browser.session.cookies.set_cookie(create_cookie('session', 'foo', domain='weboob.org'))
+        cookies = base64.b64encode(zlib.compress(pickle.dumps(browser.session.cookies, -1)))
+
+        browser = MyStatesBrowser()
+        browser.load_state({'cookies': cookies, 'url': 'http://weboob.org/accounts'})
+        self.assertEqual(browser.session.cookies.get('session'), 'foo')
+        self.assertEqual(browser.locations, ['http://weboob.org/accounts'])
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+from unittest import TestCase
+
+import requests
+
+from weboob.browser import Browser
+from weboob.browser.elements import DictElement, ItemElement, method
+from weboob.browser.filters.json import Dict
+from weboob.browser.pages import XLSPage
+from weboob.capabilities.base import BaseObject
+from weboob.tools.test import SkipTest
+
+
+class ObjectsElement(DictElement):
+    class item(ItemElement):
+        klass = BaseObject
+
+        obj_id = Dict('Id')
+        obj_url = Dict('Url')
+
+
+class LazyObjectsElement(ObjectsElement):
+    lazy = True
+
+
+class MyXLSPage(XLSPage):
+    HEADER = 1
+    SHEET_INDEX = 1
+
+    iter_objects = method(ObjectsElement)
+
+
+class MyLazyXLSPage(MyXLSPage):
+    ON_DEMAND = True
+
+    iter_objects = method(LazyObjectsElement)
+
+
+class XLSPageTest(TestCase):
+    def setUp(self):
+        try:
+            import xlwt
+        except ImportError:
+            raise SkipTest('xlwt is not installed')
+
+        wb = xlwt.Workbook()
+        wb.add_sheet('Ignored').write(0, 0, 'foo')
+        sheet = wb.add_sheet('Objects')
+        for i, row in enumerate([['Id', 'Url/'], ['1', 'a'], ['2', 'b'], ['3', 'c'], ['Total', '3']]):
+            for j, value in enumerate(row):
+                sheet.write(i, j, value)
+        f = BytesIO()
+        wb.save(f)
+
+        self.response = requests.Response()
+        self.response._content = f.getvalue()
+        self.response.url = 'http://weboob.org/objects.xls'
+        self.browser = Browser()
+
+    def test_rows(self):
+        page = MyXLSPage(self.browser, self.response)
+        self.assertEqual(page.doc, [{'Id': '1', 'Url': 'a'}, {'Id': '2', 'Url': 'b'}, {'Id': '3', 'Url': 'c'}])
+
+        page = MyLazyXLSPage(self.browser, self.response)
+        self.assertNotIsInstance(page.doc, list)
+        self.assertEqual(list(page.doc), list(page.doc))
+        self.assertEqual(list(page.doc), MyXLSPage(self.browser, self.response).doc)
+
+    def test_lazy_element(self):
+        objects = list(MyXLSPage(self.browser, self.response).iter_objects())
+        lazy = MyLazyXLSPage(self.browser, self.response).iter_objects()
+        self.assertEqual(next(lazy).id, '1')
+        self.assertEqual([obj.id for obj in lazy], ['2', '3'])
+        self.assertEqual([(obj.id, obj.url) for obj in objects], [('1', 'a'), ('2', 'b'), ('3', 'c')])
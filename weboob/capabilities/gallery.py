@@ -106,6 +106,13 @@ class CapGallery(Capability):
      SEARCH_VIEWS,
      SEARCH_DATE) = range(4)
 
+    STREAM_IMAGES = False
+    """
+    Set to True when the data of an image is the response of a plain GET
+    request on its URL with the module browser, so applications can
+    download images in parallel without filling their data.
+    """
+
     def search_galleries(self, pattern, sortby=SEARCH_RELEVANCE):
         """
         Iter results of a search on a pattern.
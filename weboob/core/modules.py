@@ -20,6 +20,7 @@
 import os
 import imp
 import logging
+import time
 
 from weboob.tools.backend import Module
 from weboob.tools.log import getLogger
@@ -109,6 +110,7 @@ class ModulesLoader(object):
         self.version = version
         self.path = path
         self.loaded = {}
+        self.load_times = {}
         self.logger = getLogger('modules')
 
     def get_or_load_module(self, module_name):
@@ -142,6 +144,7 @@ class ModulesLoader(object):
 
         path = self.get_module_path(module_name)
 
+        start = time.time()
         try:
             fp, pathname, description = imp.find_module(module_name, [path])
             try:
@@ -159,7 +162,9 @@ class ModulesLoader(object):
                                                % (module.version, self.version))
 
         self.loaded[module_name] = module
-        self.logger.debug('Loaded module "%s" from %s' % (module_name, module.package.__path__[0]))
+        self.load_times[module_name] = time.time() - start
+        self.logger.debug('Loaded module "%s" from %s in %.3fs' % (module_name, module.package.__path__[0],
+                                                                   self.load_times[module_name]))
 
     def get_module_path(self, module_name):
         return self.path
@@ -46,6 +46,7 @@ import hashlib
 import time
 import urllib
 import urllib2
+from urlparse import urlparse
 import mimetypes
 import logging
 from contextlib import closing
@@ -55,9 +56,11 @@ import warnings
 from weboob.exceptions import BrowserUnavailable, BrowserIncorrectPassword, BrowserPasswordExpired, BrowserForbidden, BrowserBanned, BrowserHTTPNotFound, BrowserHTTPError, FormFieldConversionWarning, BrowserSSLError
 from weboob.tools.decorators import retry
 from weboob.tools.log import getLogger
+from weboob.tools.ratelimit import wait_host
 from weboob.deprecated.mech import ClientForm
 ControlNotFoundError = ClientForm.ControlNotFoundError
 from weboob.deprecated.browser.parsers import get_parser
+from weboob.deprecated.browser.transport import create_session, install_session_handlers, get_peer_certificate
 
 __all__ = ['BrowserIncorrectPassword', 'BrowserForbidden', 'BrowserBanned', 'BrowserUnavailable', 'BrowserRetry',
            'BrowserPasswordExpired', 'BrowserHTTPNotFound', 'BrowserHTTPError', 'BrokenPageError', 'Page',
@@ -89,6 +92,23 @@ class NoHistory(object):
         pass
 
 
+class RateLimitHandler(mechanize.BaseHandler):
+    """
+    Wait before each request, redirections included, to send at most `rate`
+    requests per second to a host in the whole process.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+
+    def http_request(self, request):
+        wait_host(urlparse(request.get_full_url()).hostname, self.rate, self.burst)
+        return request
+
+    https_request = http_request
+
+
 class BrokenPageError(Exception):
     pass
 
@@ -162,6 +182,14 @@ class StandardBrowser(mechanize.Browser):
     DEBUG_MECHANIZE = False
     DEFAULT_TIMEOUT = 15
     INSECURE = False  # if True, do not validate SSL
+    # Send requests through a python-requests session, which keeps connections
+    # alive between requests. Set it to False to use the mechanize transport.
+    POOLED_TRANSPORT = True
+    CERTHASH_TTL = 600  # seconds during which certificate hashes are kept
+    # Maximum number of requests per second to a host, shared by every
+    # browser of the process which sets it, or None for no limit.
+    RATE_LIMIT = None
+    RATE_LIMIT_BURST = 1  # requests which can be sent without waiting after a pause
 
     logger = None
 
@@ -185,8 +213,13 @@ class StandardBrowser(mechanize.Browser):
 
         # Use a proxy
         self.proxy = proxy
-        if proxy is not None:
+        if self.POOLED_TRANSPORT:
+            self.session = create_session(proxy)
+            install_session_handlers(self, self.session)
+        elif proxy is not None:
             self.set_proxies(proxy)
+        if self.RATE_LIMIT:
+            self.add_handler(RateLimitHandler(self.RATE_LIMIT, self.RATE_LIMIT_BURST))
 
         # Share cookies with firefox
         if firefox_cookies:
@@ -400,18 +433,60 @@ class StandardBrowser(mechanize.Browser):
         except ControlNotFoundError:
             return
 
-    def lowsslcheck(self, domain, hsh):
+    def lowsslcheck(self, domain, hsh, port=443):
         if self.INSECURE or (self.logger is not None and self.logger.settings['ssl_insecure']) or self.proxy is not None:
             return
-        certhash = self._certhash(domain)
-        if self.logger:
-            self.logger.debug('Found %s as certificate hash' % certhash)
         if isinstance(hsh, basestring):
             hsh = [hsh]
+        certhash = self._certhash(domain, port)
+        if certhash not in hsh:
+            # The certificate may have been renewed since its hash was
+            # cached, so check it again on a new connection.
+            certhash = self._certhash(domain, port, refresh=True)
+        if certhash not in hsh and self.POOLED_TRANSPORT:
+            # Hashes may have been pinned from a connection without SNI, on
+            # which some servers give another certificate.
+            certhash = self._probe_certhash(domain, port)
+            if certhash in hsh:
+                cacheCerthash[(domain, port)] = certhash, time.time()
+        if self.logger:
+            self.logger.debug('Found %s as certificate hash' % certhash)
         if certhash not in hsh:
             raise BrowserSSLError()
 
-    def _certhash(self, domain, port=443):
+    def _certhash(self, domain, port=443, refresh=False):
+        """
+        Get the SHA-256 hash of the certificate of a server.
+
+        Hashes are kept for CERTHASH_TTL seconds in the process, unless
+        `refresh` is True. With the pooled transport, the certificate is
+        taken from a connection of the session, which is then used by the
+        next request to this server. The mechanize transport doesn't keep
+        its connections, so without it the certificate is read on a
+        separate connection.
+        """
+        if not refresh:
+            try:
+                certhash, timestamp = cacheCerthash[(domain, port)]
+            except KeyError:
+                pass
+            else:
+                if time.time() - timestamp < self.CERTHASH_TTL:
+                    return certhash
+
+        if self.POOLED_TRANSPORT:
+            cert = get_peer_certificate(self.session, domain, port, reconnect=refresh)
+            certhash = hashlib.sha256(cert).hexdigest()
+        else:
+            certhash = self._probe_certhash(domain, port)
+        cacheCerthash[(domain, port)] = certhash, time.time()
+        return certhash
+
+    def _probe_certhash(self, domain, port=443):
+        """
+        Get the SHA-256 hash of the certificate of a server on a new
+        connection, without SNI.
+        """
         for proto in HTTPSConnection2._PROTOCOLS:
             try:
                 certs = ssl.get_server_certificate((domain, port), ssl_version=proto)
@@ -464,6 +539,7 @@ class Browser(StandardBrowser):
     DOMAIN = None
     PROTOCOL = 'http'
     PAGES = {}
+    _pages_table = None
 
     # SHA-256 hash of server certificate. If set, it will automatically check it,
     # and raise a SSLError exception if it doesn't match.
@@ -631,13 +707,19 @@ class Browser(StandardBrowser):
                 response.set_data(data)
         mechanize.Browser._set_response(self, response, *args, **kwargs)
 
-    def get_page(self, result):
-        # Find page from url
-        pageCls = None
-        parser = None
-        page_groups = None
-        page_group_dict = None
-        for key, value in self.PAGES.items():
+    @staticmethod
+    def compile_pages(pages):
+        """
+        Compile the PAGES table.
+
+        :param pages: PAGES table
+        :type pages: dict
+        :returns: list of (regexp, page class, parser), in the order of the
+                  table. The parser is None if the page uses the browser's one.
+        :rtype: list
+        """
+        table = []
+        for key, value in pages.iteritems():
             if isinstance(key, basestring):
                 if not key.startswith('^') and not key.endswith('$'):
                     regexp = re.compile('^%s$' % key)
@@ -645,18 +727,40 @@ class Browser(StandardBrowser):
                     regexp = re.compile(key)
             else:
                 regexp = key
-            m = regexp.search(result.geturl())
+            if isinstance(value, (list, tuple)):
+                table.append((regexp, value[0], value[1]))
+            else:
+                table.append((regexp, value, None))
+        return table
+
+    def find_page(self, url):
+        """
+        Find the page matching an URL in PAGES.
+
+        The compiled table is kept on the class, or on the browser when it
+        has its own PAGES, until PAGES is replaced by another dict.
+
+        :returns: (page class, parser, match), or (None, None, None) if no
+                  page matches
+        """
+        pages = self.PAGES
+        cache = self._pages_table
+        if cache is None or cache[0] is not pages:
+            cache = (pages, self.compile_pages(pages))
+            if 'PAGES' in self.__dict__:
+                self._pages_table = cache
+            else:
+                type(self)._pages_table = cache
+
+        for regexp, pageCls, parser in cache[1]:
+            m = regexp.search(url)
             if m:
-                if isinstance(value, (list, tuple)):
-                    pageCls = value[0]
-                    parser = value[1]
-                else:
-                    pageCls = value
-                    parser = self.parser
+                return pageCls, parser or self.parser, m
+        return None, None, None
 
-                page_groups = m.groups()
-                page_group_dict = m.groupdict()
-                break
+    def get_page(self, result):
+        # Find page from url
+        pageCls, parser, m = self.find_page(result.geturl())
 
         # Not found
         if not pageCls:
@@ -671,7 +775,7 @@ class Browser(StandardBrowser):
             self.save_response(result)
 
         document = self.get_document(result, parser, encoding=pageCls.ENCODING)
-        return pageCls(self, document, result.geturl(), groups=page_groups, group_dict=page_group_dict, logger=self.logger)
+        return pageCls(self, document, result.geturl(), groups=m.groups(), group_dict=m.groupdict(), logger=self.logger)
 
     def _change_location(self, result, no_login=False):
         """
@@ -759,6 +863,11 @@ if hasattr(ssl, '_create_unverified_context'):
     ssl._create_default_https_context = ssl._create_unverified_context
 
 
+# SHA-256 hashes of server certificates, with the time they were computed,
+# by (host, port).
+cacheCerthash = {}
+
+
 class DNSTimeoutException(Exception):
     pass
 
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import cookielib
+import socket
+import ssl
+import urllib2
+from io import BytesIO
+
+import mechanize
+from mechanize._response import closeable_response
+import requests
+
+from weboob.browser.sessions import WeboobSession
+
+
+__all__ = ['create_session', 'install_session_handlers', 'get_peer_certificate']
+
+
+def create_session(proxy=None, max_retries=2):
+    """
+    Create a python-requests session to send requests of a mechanize browser.
+
+    Cookies, redirections and content encoding are still handled by
+    mechanize, so the session does not store cookies and does not add
+    headers. Like the mechanize transport, certificates are not verified:
+    modules check them with :meth:`StandardBrowser.lowsslcheck`.
+
+    :param proxy: proxies to use, by scheme
+    :type proxy: dict
+    :rtype: :class:`weboob.browser.sessions.WeboobSession`
+    """
+    session = WeboobSession()
+    session.headers.clear()
+    session.cookies.set_policy(cookielib.DefaultCookiePolicy(allowed_domains=[]))
+    session.verify = False
+    try:
+        requests.packages.urllib3.disable_warnings()
+    except AttributeError:
+        # urllib3 is too old, warnings won't be disable
+        pass
+    if proxy is not None:
+        session.proxies = proxy
+
+    adapter_kwargs = dict(max_retries=max_retries)
+    session.mount('https://', requests.adapters.HTTPAdapter(**adapter_kwargs))
+    session.mount('http://', requests.adapters.HTTPAdapter(**adapter_kwargs))
+    return session
+
+
+class SessionHandlerMixin(object):
+    def __init__(self, session):
+        super(SessionHandlerMixin, self).__init__()
+        self.session = session
+
+    def session_open(self, req):
+        headers = dict(req.headers)
+        headers.update(req.unredirected_hdrs)
+        timeout = req.timeout if isinstance(req.timeout, (int, long, float)) else None
+
+        try:
+            r = self.session.request(req.get_method(), req.get_full_url(), data=req.get_data(),
+                                     headers=headers, timeout=timeout, stream=True,
+                                     allow_redirects=False)
+        except requests.RequestException as e:
+            raise urllib2.URLError(e)
+
+        try:
+            # Read the body as sent by the server: mechanize browsers
+            # decompress it themselves.
+            data = r.raw.read(decode_content=False)
+        except requests.packages.urllib3.exceptions.HTTPError as e:
+            r.close()
+            raise urllib2.URLError(e)
+        # The whole body is read, so the connection can be used by the next
+        # request.
+        r.raw.release_conn()
+
+        return closeable_response(BytesIO(data), r.raw._original_response.msg,
+                                  req.get_full_url(), r.status_code, r.reason)
+
+    def close(self):
+        self.session.close()
+
+
+class SessionHTTPHandler(SessionHandlerMixin, mechanize.HTTPHandler):
+    def http_open(self, req):
+        return self.session_open(req)
+
+
+class SessionHTTPSHandler(SessionHandlerMixin, mechanize.HTTPSHandler):
+    def https_open(self, req):
+        return self.session_open(req)
+
+
+def install_session_handlers(browser, session):
+    """
+    Send HTTP and HTTPS requests of a mechanize browser through a
+    python-requests session, to reuse connections between requests.
+
+    :param browser: mechanize browser
+    :type browser: :class:`mechanize.Browser`
+    :param session: session created by :func:`create_session`
+    :type session: :class:`requests.Session`
+    """
+    # Proxies are given to the session.
+    browser._replace_handler('_proxy', None)
+    browser._replace_handler('http', SessionHTTPHandler(session))
+    browser._replace_handler('https', SessionHTTPSHandler(session))
+
+
+def drain_handshake(sock):
+    """
+    Read the TLS records sent by the server after the handshake, like
+    session tickets, so the connection does not look dropped while it waits
+    in the pool.
+    """
+    timeout = sock.gettimeout()
+    sock.settimeout(0.0)
+    try:
+        sock.recv(1)
+    except (ssl.SSLError, socket.error):
+        pass
+    finally:
+        sock.settimeout(timeout)
+
+
+def get_peer_certificate(session, host, port=443, reconnect=False):
+    """
+    Get the certificate of a server from a connection of a session.
+
+    The connection is opened if there is none in the pool, and is given back
+    to the pool to be used by the next request to this server.
+
+    :param reconnect: open a new connection even if there is one in the pool
+    :type reconnect: bool
+    :rtype: str
+    :returns: certificate in PEM format
+    :raises: :class:`urllib2.URLError` if the connection can't be opened, or
+             if the pool of the session doesn't give its connections
+    """
+    url = 'https://%s:%d/' % (host, port)
+    adapter = session.get_adapter(url)
+    pool = adapter.get_connection(url)
+    adapter.cert_verify(pool, url, False, None)
+
+    # urllib3 has no public method to get a connection from a pool without
+    # sending a request.
+    if not hasattr(pool, '_get_conn') or not hasattr(pool, '_put_conn'):
+        raise urllib2.URLError('unable to get a connection to %s:%d from the pool' % (host, port))
+
+    conn = pool._get_conn()
+    try:
+        if reconnect:
+            conn.close()
+        if conn.sock is None:
+            conn.connect()
+            drain_handshake(conn.sock)
+        der = conn.sock.getpeercert(True)
+    except requests.packages.urllib3.exceptions.HTTPError as e:
+        conn.close()
+        raise urllib2.URLError(e)
+    except:
+        conn.close()
+        raise
+    finally:
+        pool._put_conn(conn)
+    return ssl.DER_cert_to_PEM_cert(der)
@@ -24,8 +24,10 @@ import logging
 import optparse
 from optparse import OptionGroup, OptionParser
 from datetime import datetime
+from itertools import islice
 import os
 import sys
+import time
 import warnings
 
 from weboob.capabilities.base import ConversionWarning, BaseObject
@@ -33,6 +35,7 @@ from weboob.core import Weboob, CallErrors
 from weboob.core.backendscfg import BackendsConfig
 from weboob.tools.config.iconfig import ConfigError
 from weboob.exceptions import FormFieldConversionWarning
+from weboob.tools.limit import limit_results
 from weboob.tools.log import createColoredFormatter, getLogger, DEBUG_FILTERS, settings as log_settings
 from weboob.tools.misc import to_unicode, guess_encoding
 from .results import ResultsConditionError
@@ -171,6 +174,8 @@ class Application(object):
         logging_options.add_option('-a', '--save-responses', action='store_true', help='save every response')
         self._parser.add_option_group(logging_options)
         self._parser.add_option('--shell-completion', action='store_true', help=optparse.SUPPRESS_HELP)
+        self._parser.add_option('--profile-startup', action='store_true',
+                                help='display time spent to import packages and load modules')
         self._is_default_count = True
 
     def guess_encoding(self, stdio=None):
@@ -271,24 +276,63 @@ class Application(object):
             backend.fillobj(obj, fields)
         return obj
 
-    def _do_complete_iter(self, backend, count, fields, res):
-        modif = 0
+    def _do_complete_many(self, backend, fields, objs):
+        to_fill = [obj for obj in objs if obj and isinstance(obj, BaseObject)]
+        for obj in to_fill:
+            obj.backend = backend.name
+        if len(to_fill) <= 1 or (fields is not None and len(fields) == 0):
+            return [self._do_complete_obj(backend, fields, obj) for obj in objs]
 
-        for i, sub in enumerate(res):
-            sub = self._do_complete_obj(backend, fields, sub)
-            if self.condition and self.condition.limit and \
-               self.condition.limit == i:
-                return
+        backend.fill_many(to_fill, fields)
+        return objs
 
-            if self.condition and not self.condition.is_valid(sub):
-                modif += 1
-            else:
-                if count and i - modif == count:
-                    if self._is_default_count:
-                        raise MoreResultsAvailable()
-                    else:
+    def _do_complete_iter(self, backend, count, fields, res):
+        modif = 0
+        i = 0
+        res = iter(res)
+        batch_size = max(getattr(backend, 'FILL_BATCH_SIZE', 1), 1)
+
+        # When results are filtered by a condition, the number of results
+        # to fetch is unknown.
+        wanted = count if not self.condition else None
+        with limit_results(wanted) as limit:
+            while True:
+                size = batch_size
+                if self.condition and self.condition.limit:
+                    size = min(size, self.condition.limit - i)
+                    if size <= 0:
                         return
-                yield sub
+                if count and not self.condition:
+                    # Read one more object than wanted to know if there are
+                    # more results, but do not complete it.
+                    size = min(size, max(count - i, 1))
+
+                batch = list(islice(res, size))
+                if not batch:
+                    break
+
+                to_fill = batch
+                if count and not self.condition:
+                    to_fill = batch[:count - i]
+                batch = self._do_complete_many(backend, fields, to_fill) + batch[len(to_fill):]
+
+                for sub in batch:
+                    if count and i - modif == count:
+                        if self._is_default_count:
+                            raise MoreResultsAvailable()
+                        else:
+                            return
+
+                    if self.condition and not self.condition.is_valid(sub):
+                        modif += 1
+                    else:
+                        limit.consume()
+                        yield sub
+                    i += 1
+
+            # Pagination stopped because enough results have been read.
+            if limit.truncated and self._is_default_count:
+                raise MoreResultsAvailable()
 
     def _do_complete(self, backend, count, selected_fields, function, *args, **kwargs):
         assert count is None or count > 0
@@ -437,8 +481,8 @@ class Application(object):
 
         For example:
 
-        >>> from weboob.application.myapplication import MyApplication
-        >>> MyApplication.run()
+        >>> from weboob.application.myapplication import MyApplication  # doctest: +SKIP
+        >>> MyApplication.run()  # doctest: +SKIP
         """
 
         cls.setup_logging(logging.INFO, [cls.create_default_logger()])
@@ -446,14 +490,30 @@ class Application(object):
         if args is None:
             args = [(cls.stdin.encoding and isinstance(arg, bytes) and arg.decode(cls.stdin.encoding) or to_unicode(arg)) for arg in sys.argv]
 
+        # Start profiling before the options are parsed, to measure the
+        # creation of the application.
+        profiler = None
+        if '--profile-startup' in args:
+            from .profile import StartupProfiler
+            profiler = StartupProfiler()
+            profiler.start()
+
         try:
             app = cls()
         except BackendsConfig.WrongPermissions as e:
             print(e, file=cls.stderr)
             sys.exit(1)
+        if profiler:
+            profiler.steps.append(('create application', time.time() - profiler.start_time))
 
         try:
             try:
+                if profiler:
+                    with profiler.step('parse options'):
+                        args = app.parse_args(args)
+                    with profiler.step('run command'):
+                        ret = app.main(args)
+                    sys.exit(ret)
                 args = app.parse_args(args)
                 sys.exit(app.main(args))
             except KeyboardInterrupt:
@@ -474,4 +534,43 @@ class Application(object):
                 print('%s' % e, file=cls.stderr)
                 sys.exit(1)
         finally:
+            if profiler:
+                profiler.stop()
+                loader = getattr(app.weboob, 'modules_loader', None)
+                profiler.modules = getattr(loader, 'load_times', {})
+                profiler.report(cls.stderr)
             app.deinit()
+
+
+def test():
+    from weboob.capabilities.base import NotLoaded, StringField
+
+    class Item(BaseObject):
+        title = StringField('Title')
+
+    class Backend(object):
+        name = 'backend'
+        FILL_BATCH_SIZE = 3
+
+        def __init__(self):
+            self.batches = []
+
+        def fillobj(self, obj, fields=None):
+            obj.title = u'Title %s' % obj.id
+
+        def fill_many(self, objs, fields=None):
+            self.batches.append([obj.id for obj in objs])
+            for obj in objs:
+                self.fillobj(obj, fields)
+
+    app = Application.__new__(Application)
+    app.condition = None
+    app._is_default_count = False
+    backend = Backend()
+    items = [Item(u'%d' % i) for i in range(10)]
+    results = list(app._do_complete_iter(backend, 7, None, iter(items)))
+    assert [obj.id for obj in results] == [u'%d' % i for i in range(7)]
+    assert all(obj.title == u'Title %s' % obj.id and obj.backend == 'backend' for obj in results)
+    # The object read to know if there are more results is not filled.
+    assert backend.batches == [[u'0', u'1', u'2'], [u'3', u'4', u'5']], backend.batches
+    assert items[7].title is NotLoaded
@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+import getpass
+import logging
+import os
+import socket
+import sys
+
+from weboob.tools.json import json
+
+
+__all__ = ['ApplicationDaemon', 'forward']
+
+
+# Channels of frames sent by the daemon.
+STDOUT = 'o'
+STDERR = 'e'
+EXIT = 'x'
+REFUSED = 'r'
+# Frame asking the client to read its standard input.
+INPUT = 'i'
+
+
+def send_frame(conn, channel, data):
+    conn.sendall(b'%s%d\n%s' % (channel, len(data), data))
+
+
+def forward(path, klass, argv):
+    """
+    Run a command of an application in a daemon, and write its output.
+
+    :param path: path of the daemon socket
+    :type path: str
+    :param klass: application class
+    :type klass: :class:`weboob.tools.application.repl.ReplApplication`
+    :param argv: arguments of the command
+    :type argv: list
+    :returns: exit code of the command, or None if the daemon can't run it
+    :rtype: int
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except socket.error:
+        conn.close()
+        return None
+
+    encoding = getattr(sys.stdout, 'encoding', None)
+    request = {'module': klass.__module__,
+               'class': klass.__name__,
+               'argv': [arg.decode(sys.stdin.encoding or 'utf-8') if isinstance(arg, bytes) else arg for arg in argv],
+               'encoding': encoding,
+               'tty': sys.stdin.isatty(),
+               'cwd': os.getcwd()}
+    try:
+        conn.sendall(json.dumps(request) + '\n')
+        return relay(conn, sys.stdin, sys.stdout, sys.stderr)
+    finally:
+        conn.close()
+
+
+def relay(conn, stdin, stdout, stderr):
+    """
+    Write the output of a command run by the daemon, and send it what it
+    reads on the standard input.
+
+    :returns: exit code of the command, or None if the daemon can't run it
+    :rtype: int
+    """
+    f = conn.makefile('rb')
+    while True:
+        header = f.readline()
+        if not header:
+            print('Connection to the daemon lost', file=stderr)
+            return 1
+
+        channel, size = header[0], int(header[1:])
+        data = f.read(size)
+        if channel == STDOUT:
+            stdout.write(data)
+            stdout.flush()
+        elif channel == STDERR:
+            stderr.write(data)
+            stderr.flush()
+        elif channel == INPUT:
+            conn.sendall(read_input(stdin, data[0], data[1:]))
+        elif channel == EXIT:
+            return int(data)
+        elif channel == REFUSED:
+            return None
+
+
+def read_input(stdin, mode, prompt):
+    """
+    Read the standard input for the daemon.
+
+    :param mode: 'l' to read a line, 'a' to read everything, 'p' to ask a
+                 password with `prompt`
+    :returns: reply to send to the daemon
+    """
+    try:
+        if mode == 'p':
+            data = getpass.getpass(prompt)
+        elif mode == 'l':
+            data = stdin.readline()
+        else:
+            data = stdin.read()
+    except EOFError:
+        return b'-1\n'
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return b'%d\n%s' % (len(data), data)
+
+
+class FrameWriter(object):
+    """
+    File-like object sending what is written to a channel of the client.
+    """
+
+    BUFFER_SIZE = 4096
+
+    def __init__(self, conn, channel, encoding=None):
+        self.conn = conn
+        self.channel = channel
+        self.encoding = encoding or 'utf-8'
+        self.buffer = []
+        self.size = 0
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode(self.encoding, 'replace')
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= self.BUFFER_SIZE:
+            self.flush()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self.buffer:
+            data = b''.join(self.buffer)
+            self.buffer = []
+            self.size = 0
+            send_frame(self.conn, self.channel, data)
+
+    def isatty(self):
+        return False
+
+
+class FrameReader(object):
+    """
+    File-like object reading the standard input of the client.
+
+    Output written by the command is flushed before reading, so the client
+    sees prompts.
+    """
+
+    def __init__(self, conn, f, writers=(), encoding=None, tty=False):
+        self.conn = conn
+        self.f = f
+        self.writers = writers
+        self.encoding = encoding
+        self.tty = tty
+
+    def request(self, mode, prompt=''):
+        for writer in self.writers:
+            writer.flush()
+        send_frame(self.conn, INPUT, mode + prompt)
+        size = int(self.f.readline())
+        if size < 0:
+            raise EOFError()
+        return self.f.read(size)
+
+    def readline(self):
+        return self.request('l')
+
+    def read(self):
+        return self.request('a')
+
+    def getpass(self, prompt='Password: ', stream=None):
+        return self.request('p', prompt)
+
+    def isatty(self):
+        return self.tty
+
+
+class RunLocally(Exception):
+    """
+    Raised when a command can't be run by the daemon.
+    """
+
+
+class ApplicationDaemon(object):
+    """
+    Run commands of console applications in a long-running process.
+
+    Each application gets a :class:`weboob.core.ouiboube.Weboob` object
+    whose backends are loaded on the first command and kept for the next
+    ones, so browsers keep their sessions. Commands are run one at a time,
+    and their output is sent to the client as it is written.
+
+    Only commands given on the command line are supported: the client runs
+    the interactive shell itself.
+
+    :param path: path of the Unix socket to listen on
+    :type path: str
+    """
+
+    def __init__(self, path, logger=None):
+        from weboob.tools.log import getLogger
+
+        self.path = path
+        self.logger = getLogger('daemon', logger)
+        self.weboobs = {}
+        self.applications = {}
+        self.sock = None
+
+    def listen(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            self.sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self.sock.listen(5)
+        self.logger.info('Listening on %s' % self.path)
+
+    def serve_forever(self):
+        if self.sock is None:
+            self.listen()
+        while True:
+            conn, addr = self.sock.accept()
+            try:
+                self.handle(conn)
+            except socket.error as e:
+                self.logger.warning('Client disconnected: %s' % e)
+            finally:
+                conn.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+        # Unload backends to save their browsers' state.
+        for weboob in self.weboobs.itervalues():
+            weboob.want_stop()
+            weboob.deinit()
+        self.weboobs.clear()
+
+    def handle(self, conn):
+        f = conn.makefile('rb')
+        try:
+            request = json.loads(f.readline())
+            module, name = request['module'], request['class']
+        except (ValueError, KeyError) as e:
+            send_frame(conn, STDERR, 'Invalid request: %s\n' % e)
+            send_frame(conn, EXIT, '1')
+            return
+
+        try:
+            klass = self.get_application(module, name)
+        except (ImportError, AttributeError) as e:
+            # The client runs the command itself.
+            self.logger.info('Unable to run commands of %s.%s: %s' % (module, name, e))
+            send_frame(conn, REFUSED, '')
+            return
+
+        stdout = FrameWriter(conn, STDOUT, request.get('encoding'))
+        stderr = FrameWriter(conn, STDERR, request.get('encoding'))
+        stdin = FrameReader(conn, f, (stdout, stderr), request.get('encoding'), request.get('tty', False))
+        # Relative paths given in arguments are relative to the client.
+        cwd = os.getcwd()
+        try:
+            os.chdir(request.get('cwd') or cwd)
+            ret = self.run_command(klass, request['argv'], stdout, stderr, stdin)
+        finally:
+            os.chdir(cwd)
+        stdout.flush()
+        stderr.flush()
+        if ret is None:
+            send_frame(conn, REFUSED, '')
+        else:
+            send_frame(conn, EXIT, str(ret))
+
+    def get_application(self, module, name):
+        """
+        Get the class used to run commands of an application in the daemon.
+        """
+        from weboob.tools.application.repl import ReplApplication
+
+        key = (module, name)
+        if key in self.applications:
+            return self.applications[key]
+
+        if not module.startswith('weboob.applications.'):
+            raise ImportError('%s is not a weboob application' % module)
+        __import__(module)
+        klass = getattr(sys.modules[module], name)
+        if not issubclass(klass, ReplApplication):
+            raise ImportError('%s is not a console application' % name)
+
+        return self.wrap_application(klass)
+
+    def wrap_application(self, klass):
+        """
+        Create the class used to run commands of an application in the
+        daemon, keeping its backends loaded between commands.
+        """
+        key = (klass.__module__, klass.__name__)
+        if key in self.applications:
+            return self.applications[key]
+
+        daemon = self
+
+        class DaemonApplication(klass):
+            def create_weboob(self):
+                if key not in daemon.weboobs:
+                    daemon.weboobs[key] = klass.create_weboob(self)
+                return daemon.weboobs[key]
+
+            def create_storage(self, path=None, klass=None, localonly=False):
+                # Loaded backends keep the storage of the first command.
+                if localonly or self.weboob.storage is None:
+                    return super(DaemonApplication, self).create_storage(path, klass, localonly)
+
+                from .base import ApplicationStorage
+                self.storage = ApplicationStorage(self.APPNAME, self.weboob.storage)
+                self.storage.load(self.STORAGE)
+                return self.weboob.storage
+
+            def load_backends(self, caps=None, names=None, exclude=None, *args, **kwargs):
+                if names is None and self.options.backends:
+                    names = self.options.backends.split(',')
+                if exclude is None and self.options.exclude_backends:
+                    exclude = self.options.exclude_backends.split(',')
+                if caps is not None and not isinstance(caps, (tuple, list)):
+                    caps = (caps,)
+
+                # Select the wanted backends which are already loaded, and
+                # load the other ones, like backends configured since the
+                # previous command.
+                selected = {}
+                for backend in self.weboob.backend_instances.itervalues():
+                    if names is not None and backend.name not in names or \
+                       exclude is not None and backend.name in exclude or \
+                       caps is not None and not backend.has_caps(*caps):
+                        continue
+                    self.enabled_backends.add(backend)
+                    selected[backend.name] = backend
+
+                exclude = list(exclude or ()) + list(self.weboob.backend_instances)
+                selected.update(super(DaemonApplication, self).load_backends(caps, names, exclude, *args, **kwargs))
+                return selected
+
+            def acquire_input(self, content=None, editor_params=None):
+                if self.stdin.isatty():
+                    # The editor can't be run on the terminal of the client.
+                    raise RunLocally()
+                return super(DaemonApplication, self).acquire_input(content, editor_params)
+
+        DaemonApplication.__name__ = klass.__name__
+        self.applications[key] = DaemonApplication
+        return DaemonApplication
+
+    def run_command(self, klass, argv, stdout, stderr, stdin=None):
+        """
+        Run a command.
+
+        :param stdin: standard input of the command, like a
+                      :class:`FrameReader`; by default, it is empty
+        :returns: exit code, or None if the command can't be run by the daemon
+        """
+        from io import BytesIO
+
+        from weboob.core import CallErrors
+        from weboob.tools.config.iconfig import ConfigError
+        from weboob.tools.misc import get_backtrace
+        from .console import BackendNotFound
+        from .results import ResultsConditionError
+
+        if stdin is None:
+            stdin = BytesIO()
+        streams = sys.stdin, sys.stdout, sys.stderr
+        log_handlers, log_level = logging.root.handlers, logging.root.level
+        sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+        klass.stdin, klass.stdout, klass.stderr = stdin, stdout, stderr
+        # Hidden inputs, like passwords, are read by the client.
+        getpass_func = getpass.getpass
+        if hasattr(stdin, 'getpass'):
+            getpass.getpass = stdin.getpass
+        try:
+            app = klass()
+            app._parser.prog = os.path.basename(argv[0])
+            try:
+                args = app.parse_args(argv)
+                if len(args) < 2:
+                    # Interactive shell.
+                    return None
+                return app.main(args) or 0
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    return e.code or 0
+                print(e.code, file=stderr)
+                return 1
+            except CallErrors as e:
+                app.bcall_errors_handler(e)
+                return 1
+            except BackendNotFound as e:
+                print('Error: Backend "%s" not found.' % e, file=stderr)
+                return 1
+            except ConfigError as e:
+                print('Configuration error: %s' % e, file=stderr)
+                return 1
+            except (ResultsConditionError, EOFError) as e:
+                print('%s' % e, file=stderr)
+                return 1
+        except RunLocally:
+            return None
+        except socket.error:
+            raise
+        except Exception as e:
+            self.logger.exception(e)
+            print(get_backtrace(e), file=stderr)
+            return 1
+        finally:
+            getpass.getpass = getpass_func
+            sys.stdin, sys.stdout, sys.stderr = streams
+            del klass.stdin, klass.stdout, klass.stderr
+            klass.setup_logging(log_level, log_handlers)
+
+
+def test():
+    import shutil
+    import tempfile
+    import threading
+    from io import BytesIO
+
+    from weboob.core.ouiboube import WebNip
+    from weboob.tools.backend import Module
+    from .repl import ReplApplication
+
+    class FakeModule(Module):
+        NAME = 'fake'
+
+    class FakeWeboob(WebNip):
+        def __init__(self, workdir):
+            WebNip.__init__(self, modules_path='')
+            self.workdir = workdir
+            self.configured = ['a', 'b', 'c']
+            self.loads = []
+
+        def load_backends(self, caps=None, names=None, modules=None, exclude=None, storage=None, errors=None):
+            loaded = {}
+            for name in self.configured:
+                if names is not None and name not in names or exclude is not None and name in exclude:
+                    continue
+                loaded[name] = self.backend_instances[name] = FakeModule(self, name)
+            self.loads.append(sorted(loaded))
+            return loaded
+
+    tmpdir = tempfile.mkdtemp()
+
+    class App(ReplApplication):
+        APPNAME = 'daemontest'
+        VERSION = '1.2'
+        COPYRIGHT = 'Copyright(C) 2016 weboob project'
+        CONFDIR = tmpdir
+
+        def create_weboob(self):
+            return FakeWeboob(tmpdir)
+
+        def do_names(self, line):
+            """
+            names
+
+            Display names of enabled backends.
+            """
+            print(' '.join(sorted(backend.name for backend in self.enabled_backends)))
+
+        def do_hello(self, line):
+            """
+            hello
+
+            Greet the user.
+            """
+            print('Hello %s' % self.ask('Name'))
+
+    daemon = ApplicationDaemon(os.path.join(tmpdir, 'socket'))
+    klass = daemon.wrap_application(App)
+    assert daemon.get_application(App.__module__, App.__name__) is klass
+
+    def run(*argv):
+        stdout, stderr = BytesIO(), BytesIO()
+        ret = daemon.run_command(klass, ['daemontest'] + list(argv), stdout, stderr)
+        return ret, stdout.getvalue(), stderr.getvalue()
+
+    try:
+        assert run('-b', 'a', 'names') == (0, 'a\n', '')
+        assert run('-e', 'a', 'names') == (0, 'b c\n', '')
+        weboob = daemon.weboobs[(App.__module__, App.__name__)]
+        a = weboob.backend_instances['a']
+        # A backend configured while the daemon runs is loaded by the next
+        # command, and the other ones are kept.
+        weboob.configured.append('d')
+        assert run('names') == (0, 'a b c d\n', '')
+        assert weboob.backend_instances['a'] is a
+        assert weboob.loads == [['a'], ['b', 'c'], ['d']]
+        # Without an input, prompts are aborted instead of blocking.
+        assert run('hello') == (0, 'Name: \nAborted.\n', '')
+        assert run('unknown')[0] == 1
+
+        # The answer is read by the client.
+        def serve(conn):
+            try:
+                daemon.handle(conn)
+            finally:
+                conn.close()
+
+        client, server = socket.socketpair()
+        thread = threading.Thread(target=serve, args=(server,))
+        thread.start()
+        request = {'module': App.__module__, 'class': App.__name__, 'argv': ['daemontest', 'hello']}
+        client.sendall(json.dumps(request) + '\n')
+        stdout, stderr = BytesIO(), BytesIO()
+        assert relay(client, BytesIO('Alice\n'), stdout, stderr) == 0
+        assert stdout.getvalue() == 'Name: Hello Alice\n'
+        client.close()
+        thread.join()
+
+        # Applications the daemon can't load are run by the client.
+        client, server = socket.socketpair()
+        thread = threading.Thread(target=serve, args=(server,))
+        thread.start()
+        request = {'module': 'myapp', 'class': 'MyApp', 'argv': ['myapp', 'list']}
+        client.sendall(json.dumps(request) + '\n')
+        assert relay(client, BytesIO(), BytesIO(), BytesIO()) is None
+        client.close()
+        thread.join()
+    finally:
+        daemon.close()
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+from decimal import Decimal
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from weboob.tools.json import json
+
+from .columnar import ColumnarFormatter, duration_to_us
+from .json import Encoder
+
+__all__ = ['ArrowFormatter']
+
+
+# Maximum number of digits of decimal128 values.
+DECIMAL_DIGITS = 38
+
+
+def get_decimal_scale(values):
+    """
+    Get the number of digits after the decimal point needed to store
+    decimals without losing precision, or None if they don't fit in a
+    decimal128.
+
+    >>> get_decimal_scale([Decimal('1.5'), Decimal('-12.125'), 3])
+    3
+    >>> get_decimal_scale([Decimal('0.1234567890123')])
+    13
+    >>> get_decimal_scale([Decimal('1E+40')])
+    >>> get_decimal_scale([Decimal('NaN')])
+    """
+    scale = integer_digits = 0
+    for value in values:
+        sign, digits, exponent = Decimal(value).as_tuple()
+        if not isinstance(exponent, int):
+            # NaN and infinities.
+            return None
+        scale = max(scale, -exponent)
+        integer_digits = max(integer_digits, len(digits) + exponent)
+    if scale + integer_digits > DECIMAL_DIGITS:
+        return None
+    return scale
+
+
+class ArrowFormatter(ColumnarFormatter):
+    """
+    Write objects as Apache Arrow streams, one record batch every
+    BATCH_SIZE objects.
+
+    Decimals keep the number of digits after the decimal point of their
+    values, or are stored as strings if they don't fit in 38 digits.
+    Durations are stored as integers of microseconds.
+
+    The schema of a stream can't change, so when the type of a column
+    changes, a new stream is written after the current one. Readers have
+    to read streams until the end of the output.
+    """
+
+    def __init__(self):
+        if pa is None:
+            raise ImportError('Please install python-pyarrow')
+        ColumnarFormatter.__init__(self)
+        self.writer = None
+        self.schema = None
+        self.decimal_scales = None
+
+    def get_arrow_type(self, type, scale=None):
+        if type == 'decimal':
+            if scale is None:
+                return pa.string()
+            return pa.decimal128(DECIMAL_DIGITS, scale)
+        return {'int': pa.int64(),
+                'float': pa.float64(),
+                'string': pa.string(),
+                'binary': pa.binary(),
+                'bool': pa.bool_(),
+                'date': pa.date32(),
+                'timestamp': pa.timestamp('us'),
+                'time': pa.time64('us'),
+                'duration': pa.int64(),
+                'json': pa.string(),
+               }[type]
+
+    def convert(self, value, type):
+        if type == 'decimal':
+            return Decimal(value)
+        if type == 'date' and isinstance(value, datetime.datetime):
+            return value.date()
+        if type == 'time' and isinstance(value, datetime.datetime):
+            return value.time()
+        if type == 'duration':
+            return duration_to_us(value)
+        if type == 'json':
+            return json.dumps(value, cls=Encoder)
+        return value
+
+    def start(self):
+        self.decimal_scales = [0] * len(self.columns)
+
+    def write_columns(self, columns, count):
+        fields = []
+        arrays = []
+        for i, (values, (name, type)) in enumerate(zip(columns, self.columns)):
+            scale = None
+            if type == 'decimal':
+                # Scales only grow, so a new stream is only started when
+                # values need more digits.
+                if self.decimal_scales[i] is not None:
+                    scale = get_decimal_scale([value for value in values if value is not None])
+                    if scale is not None:
+                        scale = max(scale, self.decimal_scales[i])
+                    self.decimal_scales[i] = scale
+                if scale is None:
+                    values = [None if value is None else unicode(value) for value in values]
+            arrow_type = self.get_arrow_type(type, scale)
+            fields.append(pa.field(name, arrow_type))
+            arrays.append(pa.array(values, type=arrow_type))
+
+        schema = pa.schema(fields)
+        if self.writer is None or not schema.equals(self.schema):
+            self.end()
+            self.schema = schema
+            self.writer = pa.RecordBatchStreamWriter(ArrowOutput(self), schema)
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, [name for name, type in self.columns]))
+
+    def end(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.schema = None
+
+
+class ArrowOutput(object):
+    """
+    File-like object given to pyarrow, to write to the formatter output.
+    """
+
+    closed = False
+
+    def __init__(self, formatter):
+        self.formatter = formatter
+
+    def write(self, data):
+        self.formatter.write(bytes(data))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test():
+    from io import BytesIO
+
+    from nose.plugins.skip import SkipTest
+
+    from weboob.tools.ordereddict import OrderedDict
+
+    if pa is None:
+        raise SkipTest('pyarrow is not installed')
+
+    class Formatter(ArrowFormatter):
+        BATCH_SIZE = 2
+
+        def write(self, data):
+            self.output.write(data)
+
+    formatter = Formatter()
+    formatter.output = BytesIO()
+    values = [(1, Decimal('1.5')), (2, Decimal('2.25')),
+              (None, None), (3, Decimal('0.123456789012345')),
+              (4.5, Decimal('1E+40')), (6, Decimal('3.25'))]
+    for value, amount in values:
+        formatter.format_dict(OrderedDict([('value', value), ('amount', amount)]))
+    formatter.flush()
+
+    # A stream is written for each schema.
+    source = pa.BufferReader(formatter.output.getvalue())
+    schemas = []
+    rows = []
+    while source.tell() < source.size():
+        reader = pa.RecordBatchStreamReader(source)
+        schemas.append([(field.name, str(field.type)) for field in reader.schema])
+        for batch in reader:
+            rows.extend(zip(*[column.to_pylist() for column in batch.columns]))
+    assert schemas == [[('value', 'int64'), ('amount', 'decimal(38, 2)')],
+                       [('value', 'int64'), ('amount', 'decimal(38, 15)')],
+                       [('value', 'double'), ('amount', 'string')]], schemas
+    assert rows == [(1, Decimal('1.5')), (2, Decimal('2.25')),
+                    (None, None), (3, Decimal('0.123456789012345')),
+                    (4.5, u'1E+40'), (6, u'3.25')], rows
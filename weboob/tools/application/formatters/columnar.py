@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import os
+from decimal import Decimal
+
+from weboob.capabilities.base import empty
+from weboob.tools.json import json
+from weboob.tools.ordereddict import OrderedDict
+
+from .iformatter import IFormatter
+from .json import Encoder
+
+__all__ = ['ColumnarFormatter']
+
+
+def get_column_type(types, value_types):
+    """
+    Get the type of a column from the types accepted by a field, or from
+    the types of its values if they are not known.
+
+    >>> get_column_type((int, long), set())
+    'int'
+    >>> get_column_type((Decimal,), set())
+    'decimal'
+    >>> get_column_type((datetime.date, datetime.datetime), set([datetime.date]))
+    'date'
+    >>> get_column_type((datetime.date, datetime.datetime), set([datetime.date, datetime.datetime]))
+    'timestamp'
+    >>> get_column_type((), set([unicode]))
+    'string'
+    >>> get_column_type((), set([int, float]))
+    'float'
+    >>> get_column_type((), set([dict]))
+    'json'
+    """
+    if not types:
+        types = value_types
+    if not types:
+        return 'string'
+
+    types = set(types)
+    if types <= set((int, long)):
+        return 'int'
+    if types <= set((int, long, float)):
+        return 'float'
+    if types <= set((Decimal, int, long)):
+        return 'decimal'
+    if types <= set((unicode,)):
+        return 'string'
+    if types <= set((str,)):
+        return 'binary'
+    if types <= set((bool,)):
+        return 'bool'
+    if types <= set((datetime.date, datetime.datetime)):
+        # DateField accepts both types, use the values to know if the time
+        # is relevant.
+        if datetime.date in types and not any(issubclass(t, datetime.datetime) for t in value_types):
+            return 'date'
+        return 'timestamp'
+    if types <= set((datetime.time, datetime.datetime)):
+        return 'time'
+    if types <= set((datetime.timedelta,)):
+        return 'duration'
+    return 'json'
+
+
+def duration_to_us(value):
+    return (value.days * 86400 + value.seconds) * 1000000 + value.microseconds
+
+
+class ColumnarFormatter(IFormatter):
+    """
+    Write objects as typed columns, in batches of rows.
+
+    The first line describes the columns, with their names and types, and
+    each next line is a JSON object with the values of every column for a
+    batch of rows. Decimals are written as strings to keep their precision,
+    dates and times in ISO 8601, and durations in microseconds.
+
+    Columns are given by the first formatted object. When the values of a
+    column get a type which does not fit its type, for example a float in a
+    column of integers, a new line describing the columns is written before
+    the batch.
+    """
+
+    BATCH_SIZE = 10000
+
+    def __init__(self):
+        IFormatter.__init__(self)
+        self.keys = None
+        self.columns = None
+        self.field_types = None
+        self.value_types = None
+        self.batch = []
+
+    def format_obj(self, obj, alias=None):
+        item = obj.to_dict()
+        if self.keys is None:
+            self.field_types = dict((name, field.types) for name, field in obj._fields.iteritems())
+            self.field_types['id'] = (unicode,)
+        self.add_row(item)
+
+    def format_dict(self, item):
+        self.add_row(item)
+
+    def add_row(self, item):
+        if self.keys is None:
+            self.keys = item.keys()
+        self.batch.append([item.get(key) for key in self.keys])
+        if len(self.batch) >= self.BATCH_SIZE:
+            self.write_batch()
+
+    def flush(self):
+        if self.batch:
+            self.write_batch()
+        if self.columns is not None:
+            self.end()
+        self.keys = None
+        self.columns = None
+        self.field_types = None
+        self.value_types = None
+
+    def write_batch(self):
+        # Types of values seen in previous batches are kept, so a column
+        # only changes to a type fitting all its values.
+        if self.value_types is None:
+            self.value_types = [set() for key in self.keys]
+        for i, value_types in enumerate(self.value_types):
+            value_types.update(type(row[i]) for row in self.batch if not empty(row[i]))
+
+        types = self.field_types or {}
+        columns = [(key, get_column_type(types.get(key, ()), self.value_types[i]))
+                   for i, key in enumerate(self.keys)]
+        if columns != self.columns:
+            if self.columns is not None:
+                self.end()
+            self.columns = columns
+            self.start()
+
+        columns = [[None if empty(row[i]) else self.convert(row[i], column_type)
+                    for row in self.batch]
+                   for i, (name, column_type) in enumerate(self.columns)]
+        self.write_columns(columns, len(self.batch))
+        self.batch = []
+
+    def convert(self, value, type):
+        if type == 'decimal':
+            return unicode(value)
+        if type in ('date', 'timestamp', 'time'):
+            return value.isoformat()
+        if type == 'duration':
+            return duration_to_us(value)
+        if type == 'binary':
+            return value.encode('base64')
+        return value
+
+    def start(self):
+        columns = [OrderedDict([('name', name), ('type', type)]) for name, type in self.columns]
+        self.write(json.dumps({'columns': columns}) + os.linesep)
+
+    def write_columns(self, columns, count):
+        self.write(json.dumps(OrderedDict([('rows', count), ('columns', columns)]), cls=Encoder) + os.linesep)
+
+    def end(self):
+        pass
+
+
+def test():
+    from .iformatter import formatter_test_output as fmt
+    assert fmt(ColumnarFormatter, OrderedDict([('id', u'1@foo'), ('amount', Decimal('12.30'))])) == \
+        '{"columns": [{"name": "id", "type": "string"}, {"name": "amount", "type": "decimal"}]}\n' \
+        '{"rows": 1, "columns": [["1@foo"], ["12.30"]]}\n'
+
+
+def test_type_change():
+    from io import BytesIO
+
+    class Formatter(ColumnarFormatter):
+        BATCH_SIZE = 2
+
+        def write(self, data):
+            self.output.write(data)
+
+    formatter = Formatter()
+    formatter.output = BytesIO()
+    for value in (1, 2, None, 3, 4.5, 6):
+        formatter.format_dict(OrderedDict([('value', value)]))
+    formatter.flush()
+    assert formatter.output.getvalue().splitlines() == [
+        '{"columns": [{"name": "value", "type": "int"}]}',
+        '{"rows": 2, "columns": [[1, 2]]}',
+        '{"rows": 2, "columns": [[null, 3]]}',
+        '{"columns": [{"name": "value", "type": "float"}]}',
+        '{"rows": 2, "columns": [[4.5, 6]]}',
+    ]
@@ -37,8 +37,7 @@ class CSVFormatter(IFormatter):
         if not isinstance(self.outfile, basestring):
             return self.write_dict(item, self.outfile)
 
-        with open(self.outfile, "a+") as fp:
-            return self.write_dict(item, fp)
+        return self.write_dict(item, self.get_sink())
 
     def write_dict(self, item, fp):
         writer = csv.writer(fp)
@@ -22,22 +22,31 @@ from __future__ import print_function
 
 import os
 import sys
-import subprocess
-
-try:
-    from termcolor import colored
-except ImportError:
-    def colored(s, color=None, on_color=None, attrs=None):
-        if os.getenv('ANSI_COLORS_DISABLED') is None \
-                and attrs is not None and 'bold' in attrs:
-            return '%s%s%s' % (IFormatter.BOLD, s, IFormatter.NC)
-        else:
-            return s
+import zlib
+
+_colored = None
+
+
+def colored(s, color=None, on_color=None, attrs=None):
+    # termcolor is only imported when something has to be colored.
+    global _colored
+    if _colored is None:
+        try:
+            from termcolor import colored as _colored
+        except ImportError:
+            _colored = basic_colored
+    return _colored(s, color, on_color=on_color, attrs=attrs)
+
+
+def basic_colored(s, color=None, on_color=None, attrs=None):
+    if os.getenv('ANSI_COLORS_DISABLED') is None \
+            and attrs is not None and 'bold' in attrs:
+        return '%s%s%s' % (IFormatter.BOLD, s, IFormatter.NC)
+    else:
+        return s
 
-try:
-    import tty
-    import termios
-except ImportError:
+
+if sys.platform == 'win32':
     PROMPT = '--Press return to continue--'
 
     def readch():
@@ -46,6 +55,9 @@ else:
     PROMPT = '--Press a key to continue--'
 
     def readch():
+        import tty
+        import termios
+
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
 
@@ -64,7 +76,7 @@ from weboob.tools.application.console import ConsoleApplication
 from weboob.tools.ordereddict import OrderedDict
 from weboob.tools.misc import guess_encoding
 
-__all__ = ['IFormatter', 'MandatoryFieldsNotFound']
+__all__ = ['IFormatter', 'MandatoryFieldsNotFound', 'OutputSink']
 
 
 class MandatoryFieldsNotFound(Exception):
@@ -72,6 +84,160 @@ class MandatoryFieldsNotFound(Exception):
         Exception.__init__(self, u'Mandatory fields not found: %s.' % ', '.join(missing_fields))
 
 
+_terminal_size = None
+
+
+def get_terminal_size():
+    """
+    Get the number of rows and columns of the terminal.
+
+    The size is only queried the first time, and kept for the next calls.
+
+    :rtype: tuple
+    """
+    global _terminal_size
+    if _terminal_size is None:
+        _terminal_size = _query_terminal_size()
+    return _terminal_size
+
+
+def _query_terminal_size():
+    if sys.platform == 'win32':
+        from ctypes import windll, create_string_buffer
+
+        h = windll.kernel32.GetStdHandle(-12)
+        csbi = create_string_buffer(22)
+        res = windll.kernel32.GetConsoleScreenBufferInfo(h, csbi)
+
+        if res:
+            import struct
+            (bufx, bufy, curx, cury, wattr,
+             left, top, right, bottom, maxx, maxy) = struct.unpack("hhhhHhhhhhh", csbi.raw)
+            return right - left + 1, bottom - top + 1
+        # can't determine actual size - return default values
+        return 80, 80
+
+    try:
+        import fcntl
+        import struct
+        import termios
+    except ImportError:
+        return 0, None
+
+    for fd in (sys.stdin, sys.stdout, sys.stderr):
+        try:
+            rows, cols = struct.unpack('hh', fcntl.ioctl(fd.fileno(), termios.TIOCGWINSZ, b'\0' * 4))
+        except (AttributeError, IOError, ValueError):
+            continue
+        if rows > 0 and cols > 0:
+            return rows, cols
+    return 0, None
+
+
+_projections = {}
+
+
+def project(obj, selected_fields):
+    """
+    Get a view of an object restricted to some fields.
+
+    The view is an instance of a subclass of the object's class, which
+    shares the attributes of the object instead of copying them, and hides
+    the fields which are not selected. Subclasses are built once for each
+    class and selection.
+
+    :param obj: object to restrict
+    :type obj: :class:`BaseObject`
+    :param selected_fields: names of fields to keep
+    :type selected_fields: tuple
+    :rtype: :class:`BaseObject`
+    """
+    cls = obj.__class__
+    key = (cls, tuple(selected_fields))
+    try:
+        projection = _projections[key]
+    except KeyError:
+        projection = _projections[key] = make_projection(cls, frozenset(selected_fields))
+
+    view = object.__new__(projection)
+    view.__dict__ = obj.__dict__
+    return view
+
+
+def make_projection(cls, selected):
+    def __getattr__(self, name):
+        if name in self._fields and name not in selected:
+            raise AttributeError("'%s' object has no attribute '%s'" % (cls.__name__, name))
+        return cls.__getattr__(self, name)
+
+    def iter_fields(self):
+        for name, value in cls.iter_fields(self):
+            if name in selected:
+                yield name, value
+
+    attrs = {'__getattr__': __getattr__,
+             'iter_fields': iter_fields,
+             '__module__': cls.__module__,
+             '__doc__': cls.__doc__}
+    if 'id' not in selected:
+        # As when the attribute is deleted, the class default is used.
+        attrs['id'] = property(lambda self: None)
+    return type(cls)(cls.__name__, (cls,), attrs)
+
+
+class OutputSink(object):
+    """
+    Buffered output to a file.
+
+    The file is opened in append mode. If its name ends with '.gz' or
+    '.zst', data is compressed with gzip or zstandard.
+
+    :param path: path of file
+    :type path: str
+    """
+
+    BUFFER_SIZE = 65536
+
+    def __init__(self, path):
+        self.path = path
+        self.compressor = None
+        if path.endswith('.zst'):
+            try:
+                import zstandard
+            except ImportError:
+                raise IOError('Please install python-zstandard to write "%s"' % path)
+            self.compressor = zstandard.ZstdCompressor().compressobj()
+        elif path.endswith('.gz'):
+            self.compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        self.fp = open(path, 'ab')
+        self.encoding = guess_encoding(self.fp)
+        self.buffer = []
+        self.size = 0
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode(self.encoding, 'replace')
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= self.BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        data = b''.join(self.buffer)
+        self.buffer = []
+        self.size = 0
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        self.fp.write(data)
+
+    def close(self):
+        self.flush()
+        if self.compressor is not None:
+            self.fp.write(self.compressor.flush())
+        self.fp.close()
+
+
 class IFormatter(object):
     # Tuple of fields mandatory to not crash
     MANDATORY_FIELDS = None
@@ -90,45 +256,77 @@ class IFormatter(object):
             attrs = [attrs]
         return colored(string, color, on_color=on_color, attrs=attrs)
 
-    def __init__(self, display_keys=True, display_header=True, outfile=sys.stdout):
+    def __init__(self, display_keys=True, display_header=True, outfile=None):
+        self.sink = None
+        self.encoding = None
         self.display_keys = display_keys
         self.display_header = display_header
         self.interactive = False
         self.print_lines = 0
         self.termrows = 0
         self.termcols = None
-        self.outfile = outfile
+        # sys.stdout is read when the formatter is built, as it can be
+        # replaced (for example by the daemon).
+        self.outfile = sys.stdout if outfile is None else outfile
         # XXX if stdin is not a tty, it seems that the command fails.
 
         if sys.stdout.isatty() and sys.stdin.isatty():
-            if sys.platform == 'win32':
-                from ctypes import windll, create_string_buffer
-
-                h = windll.kernel32.GetStdHandle(-12)
-                csbi = create_string_buffer(22)
-                res = windll.kernel32.GetConsoleScreenBufferInfo(h, csbi)
-
-                if res:
-                    import struct
-                    (bufx, bufy, curx, cury, wattr,
-                     left, top, right, bottom, maxx, maxy) = struct.unpack("hhhhHhhhhhh", csbi.raw)
-                    self.termrows = right - left + 1
-                    self.termcols = bottom - top + 1
-                else:
-                    self.termrows = 80  # can't determine actual size - return default values
-                    self.termcols = 80
-            else:
-                self.termrows = int(
-                    subprocess.Popen('stty size', shell=True, stdout=subprocess.PIPE).communicate()[0].split()[0]
-                )
-                self.termcols = int(
-                    subprocess.Popen('stty size', shell=True, stdout=subprocess.PIPE).communicate()[0].split()[1]
-                )
+            self.termrows, self.termcols = get_terminal_size()
+
+    @property
+    def outfile(self):
+        return self._outfile
+
+    @outfile.setter
+    def outfile(self, outfile):
+        self.close_sink()
+        self._outfile = outfile
+
+    def get_sink(self):
+        """
+        Get the sink to write to the output file. It is opened at the first
+        call, and kept opened until :meth:`close_sink` is called.
+
+        :rtype: :class:`OutputSink`
+        """
+        if self.sink is None:
+            self.sink = OutputSink(self.outfile)
+        return self.sink
+
+    def close_sink(self):
+        """
+        Write buffered data to the output file and close it.
+        """
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    def write(self, data):
+        """
+        Write data to the output, without adding a new line and without
+        paging.
+        """
+        if self.outfile != sys.stdout:
+            self.get_sink().write(data)
+        else:
+            if self.encoding is None:
+                self.encoding = guess_encoding(self.outfile)
+            if isinstance(data, unicode):
+                data = data.encode(self.encoding, 'replace')
+            sys.stdout.write(data)
 
     def output(self, formatted):
         if self.outfile != sys.stdout:
-            with open(self.outfile, "a+") as outfile:
-                outfile.write(formatted.encode(guess_encoding(outfile), 'replace') + os.linesep)
+            sink = self.get_sink()
+            sink.write(formatted)
+            sink.write(os.linesep)
+
+        elif not self.termrows:
+            if self.encoding is None:
+                self.encoding = guess_encoding(self.outfile)
+            if isinstance(formatted, unicode):
+                formatted = formatted.encode(self.encoding, 'replace')
+            print(formatted)
 
         else:
             for line in formatted.split('\n'):
@@ -170,10 +368,7 @@ class IFormatter(object):
         """
         if isinstance(obj, BaseObject):
             if selected_fields:  # can be an empty list (nothing to do), or None (return all fields)
-                obj = obj.copy()
-                for name, value in obj.iter_fields():
-                    if name not in selected_fields:
-                        delattr(obj, name)
+                obj = project(obj, selected_fields)
 
             if self.MANDATORY_FIELDS:
                 missing_fields = set(self.MANDATORY_FIELDS) - set([name for name, value in obj.iter_fields()])
@@ -188,10 +383,8 @@ class IFormatter(object):
                 raise TypeError('Please give a BaseObject or a dict')
 
             if selected_fields:
-                obj = obj.copy()
-                for name, value in obj.iteritems():
-                    if name not in selected_fields:
-                        obj.pop(name)
+                obj = OrderedDict((name, value) for name, value in obj.iteritems()
+                                  if name in selected_fields)
 
             if self.MANDATORY_FIELDS:
                 missing_fields = set(self.MANDATORY_FIELDS) - set(obj.iterkeys())
@@ -282,7 +475,9 @@ def formatter_test_output(Formatter, obj):
     fmt.outfile = name
     fmt.format(obj)
     fmt.flush()
+    fmt.close_sink()
     with open(name) as f:
         res = f.read()
     remove(name)
     return res
+
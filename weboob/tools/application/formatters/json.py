@@ -17,6 +17,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
+import os
 
 from weboob.capabilities.base import NotAvailable, NotLoaded
 from weboob.tools.json import json
@@ -46,20 +47,34 @@ class Encoder(json.JSONEncoder):
 class JsonFormatter(IFormatter):
     """
     Formats the whole list as a single JSON list object.
+
+    Items are written as soon as they are formatted, and the list is closed
+    by flush().
     """
 
     def __init__(self):
         IFormatter.__init__(self)
-        self.queue = []
+        self.started = False
 
     def flush(self):
-        self.output(json.dumps(self.queue, cls=Encoder))
+        if not self.started:
+            self.write(u'[')
+        self.write(u']' + os.linesep)
+        self.started = False
+
+    def write_item(self, item):
+        if self.started:
+            self.write(u', ')
+        else:
+            self.write(u'[')
+            self.started = True
+        self.write(json.dumps(item, cls=Encoder))
 
     def format_dict(self, item):
-        self.queue.append(item)
+        self.write_item(item)
 
     def format_collection(self, collection, only):
-        self.queue.append(collection.to_dict())
+        self.write_item(collection.to_dict())
 
 
 class JsonLineFormatter(IFormatter):
@@ -76,3 +91,20 @@ def test():
     from .iformatter import formatter_test_output as fmt
     assert fmt(JsonFormatter, {'foo': 'bar'}) == '[{"foo": "bar"}]\n'
     assert fmt(JsonLineFormatter, {'foo': 'bar'}) == '{"foo": "bar"}\n'
+
+    from weboob.capabilities.base import BaseObject, StringField
+
+    class Item(BaseObject):
+        title = StringField('Title')
+        author = StringField('Author')
+
+    obj = Item(u'1', backend='foo')
+    obj.title = u'Title'
+    obj.author = u'Author'
+
+    from .iformatter import project
+    view = project(obj, ('id', 'title'))
+    assert isinstance(view, Item)
+    assert fmt(JsonLineFormatter, view) == '{"id": "1@foo", "title": "Title"}\n'
+    assert not hasattr(view, 'author')
+    assert obj.author == u'Author'
@@ -26,7 +26,7 @@ class FormatterLoadError(Exception):
 
 
 class FormattersLoader(object):
-    BUILTINS = ['htmltable', 'multiline', 'simple', 'table', 'csv', 'webkit', 'json', 'json_line']
+    BUILTINS = ['htmltable', 'multiline', 'simple', 'table', 'csv', 'webkit', 'json', 'json_line', 'columnar', 'arrow']
 
     def __init__(self):
         self.formatters = {}
@@ -77,3 +77,11 @@ class FormattersLoader(object):
         elif name == 'json_line':
             from .json import JsonLineFormatter
             return JsonLineFormatter
+        elif name == 'columnar':
+            from .columnar import ColumnarFormatter
+            return ColumnarFormatter
+        elif name == 'arrow':
+            from .arrow import ArrowFormatter, pa
+            if pa is None:
+                raise ImportError('Please install python-pyarrow')
+            return ArrowFormatter
@@ -31,17 +31,69 @@ __all__ = ['TableFormatter', 'HTMLTableFormatter']
 class TableFormatter(IFormatter):
     HTML = False
 
+    STREAM_WINDOW = 1000
+    """
+    When more rows than this are queued, the table is written progressively:
+    columns and their widths are computed on the queued rows, and next rows
+    are written as soon as they are formatted. None to always build the
+    whole table at flush.
+    """
+
     def __init__(self):
         IFormatter.__init__(self)
         self.queue = []
         self.keys = None
         self.header = None
+        # list of (index, width) of displayed columns, when the table is
+        # written progressively.
+        self.columns = None
 
     def flush(self):
+        if self.columns is not None:
+            self.output(self.get_border())
+            self.columns = None
+            return
+
         s = self.get_formatted_table()
         if s is not None:
             self.output(s.encode(guess_encoding(self.outfile), 'replace'))
 
+    def start_stream(self):
+        self.columns = []
+        for i, key in enumerate(self.keys):
+            values = [line[i] for line in self.queue if len(line) > i]
+            # Do not display columns when all values are NotLoaded or NotAvailable
+            if all(empty(value) for value in values):
+                continue
+            width = max(len(part) for value in [self.get_column_header(key)] + values
+                        for part in unicode(value).split('\n'))
+            self.columns.append((i, width))
+
+        if self.display_header and self.header:
+            self.output(self.header)
+        border = self.get_border()
+        self.output(border)
+        self.output(self.format_row([self.get_column_header(key) for key in self.keys]))
+        self.output(border)
+        for line in self.queue:
+            self.output(self.format_row(line))
+        self.queue = []
+
+    def get_border(self):
+        return u'+%s+' % u'+'.join(u'-' * (width + 2) for i, width in self.columns)
+
+    def format_row(self, line):
+        cells = [unicode(line[i]).split('\n') if len(line) > i else [u''] for i, width in self.columns]
+        height = max(len(cell) for cell in cells)
+        rows = []
+        for n in xrange(height):
+            rows.append(u'| %s |' % u' | '.join((cell[n] if n < len(cell) else u'').ljust(width)
+                                                for cell, (i, width) in zip(cells, self.columns)))
+        return u'\n'.join(rows)
+
+    def get_column_header(self, key):
+        return key.capitalize().replace('_', ' ')
+
     def get_formatted_table(self):
         if len(self.queue) == 0:
             return
@@ -58,7 +110,7 @@ class TableFormatter(IFormatter):
                     available = True
                     break
             if available:
-                column_headers.append(self.keys[i].capitalize().replace('_', ' '))
+                column_headers.append(self.get_column_header(self.keys[i]))
                 for j in xrange(len(self.queue)):
                     if len(self.queue[j]) > i:
                         queue[j] += (self.queue[j][i],)
@@ -96,7 +148,13 @@ class TableFormatter(IFormatter):
     def format_dict(self, item):
         if self.keys is None:
             self.keys = item.keys()
+        if self.columns is not None:
+            self.output(self.format_row(item.values()))
+            return
+
         self.queue.append(item.values())
+        if self.STREAM_WINDOW and len(self.queue) >= self.STREAM_WINDOW:
+            self.start_stream()
 
     def set_header(self, string):
         self.header = string
@@ -104,6 +162,7 @@ class TableFormatter(IFormatter):
 
 class HTMLTableFormatter(TableFormatter):
     HTML = True
+    STREAM_WINDOW = None
 
 
 def test():
@@ -114,3 +173,24 @@ def test():
         '+-----+\n' \
         '| bar |\n' \
         '+-----+\n'
+
+    from tempfile import mkstemp
+    from os import remove
+
+    class WindowTableFormatter(TableFormatter):
+        STREAM_WINDOW = 2
+
+    results = []
+    for Formatter in (TableFormatter, WindowTableFormatter):
+        _, name = mkstemp()
+        fmt = Formatter()
+        fmt.outfile = name
+        fmt.format({'id': 1, 'label': u'foo', 'empty': None})
+        fmt.format({'id': 22, 'label': u'bar\nbaz', 'empty': None})
+        fmt.format({'id': 3, 'label': u'qux', 'empty': None})
+        fmt.flush()
+        fmt.close_sink()
+        with open(name) as f:
+            results.append(f.read())
+        remove(name)
+    assert results[0] == results[1]
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+import sys
+import time
+from contextlib import contextmanager
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+
+__all__ = ['StartupProfiler']
+
+
+class StartupProfiler(object):
+    """
+    Measure the time spent by an application to start.
+
+    It records the duration of steps of the application, and the time spent
+    to import each package (without the time spent to import the other
+    packages it imports).
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.imports = {}
+        self.modules = {}
+        self.start_time = None
+        self._import = None
+        self._stack = []
+
+    def start(self):
+        self.start_time = time.time()
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop(self):
+        if self._import is not None:
+            builtins.__import__ = self._import
+            self._import = None
+
+    @contextmanager
+    def step(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.time() - start))
+
+    def _timed_import(self, name, *args, **kwargs):
+        if name in sys.modules:
+            return self._import(name, *args, **kwargs)
+
+        before = len(sys.modules)
+        start = time.time()
+        self._stack.append(0.0)
+        try:
+            return self._import(name, *args, **kwargs)
+        finally:
+            duration = time.time() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += duration
+            if len(sys.modules) > before:
+                package = name.split('.')[0]
+                if package not in sys.modules:
+                    # Relative import, count it in the importer package.
+                    importer = args[0] if args else kwargs.get('globals')
+                    package = (importer or {}).get('__name__', package).split('.')[0]
+                self.imports[package] = self.imports.get(package, 0.0) + duration - children
+
+    def report(self, stream=sys.stderr, top=15):
+        """
+        Print timings.
+
+        :param top: number of packages to display
+        :type top: int
+        """
+        print(u'Startup profile (%.3fs):' % (time.time() - self.start_time), file=stream)
+        for name, duration in self.steps:
+            print(u'  %-30s %8.3fs' % (name, duration), file=stream)
+
+        if self.modules:
+            print(u'Modules loading:', file=stream)
+            for name, duration in sorted(self.modules.iteritems(), key=lambda item: -item[1]):
+                print(u'  %-30s %8.3fs' % (name, duration), file=stream)
+
+        print(u'Imports (%d packages, %d modules loaded):' % (len(self.imports), len(sys.modules)), file=stream)
+        for name, duration in sorted(self.imports.iteritems(), key=lambda item: -item[1])[:top]:
+            print(u'  %-30s %8.3fs' % (name, duration), file=stream)
+
+
+def test():
+    # A console application starting a one-shot command must not import
+    # packages only needed by some commands or formatters.
+    import subprocess
+    import os
+
+    code = 'import sys; import weboob.tools.application.repl; print(" ".join(sorted(sys.modules)))'
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    modules = subprocess.check_output([sys.executable, '-c', code], env=env).split()
+    for name in ('requests', 'lxml', 'prettytable', 'termcolor', 'readline', 'weboob.browser',
+                 'dateutil.parser', 'weboob.tools.application.formatters.table'):
+        assert name not in modules, '%s is imported at startup' % name
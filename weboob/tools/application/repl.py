@@ -26,6 +26,7 @@ import re
 from optparse import OptionGroup, OptionParser, IndentedHelpFormatter
 from datetime import datetime
 import os
+import sys
 
 from weboob.capabilities.base import FieldNotFound, BaseObject, UserError
 from weboob.core import CallErrors
@@ -149,7 +150,8 @@ class ReplApplication(Cmd, ConsoleApplication):
                                       help='select output formatter (%s)' % u', '.join(available_formatters))
         formatting_options.add_option('--no-header', dest='no_header', action='store_true', help='do not display header')
         formatting_options.add_option('--no-keys', dest='no_keys', action='store_true', help='do not display item keys')
-        formatting_options.add_option('-O', '--outfile', dest='outfile', help='file to export result')
+        formatting_options.add_option('-O', '--outfile', dest='outfile',
+                                      help='file to export result, compressed if its name ends with .gz or .zst')
         self._parser.add_option_group(formatting_options)
 
         self._interactive = False
@@ -298,6 +300,18 @@ class ReplApplication(Cmd, ConsoleApplication):
         self.collections = []
         return ConsoleApplication.load_backends(self, *args, **kwargs)
 
+    @classmethod
+    def run(klass, args=None):
+        # Forward the command to a daemon if one is running.
+        socket_path = os.environ.get('WEBOOB_DAEMON')
+        if socket_path and args is None:
+            from .daemon import forward
+            ret = forward(socket_path, klass, sys.argv)
+            if ret is not None:
+                sys.exit(ret)
+
+        super(ReplApplication, klass).run(args)
+
     def main(self, argv):
         cmd_args = argv[1:]
         if cmd_args:
@@ -340,7 +354,15 @@ class ReplApplication(Cmd, ConsoleApplication):
         backends = kwargs.pop('backends', None)
         if backends is None:
             kwargs['backends'] = []
+            # Do not call backends which can't return objects matching the condition.
+            condition_backends = self.condition.get_backends() if self.condition else None
+            if condition_backends is not None and \
+               not condition_backends.issubset(backend.name for backend in self.enabled_backends):
+                # The '@' is part of the id, not a backend name.
+                condition_backends = None
             for backend in self.enabled_backends:
+                if condition_backends is not None and backend.name not in condition_backends:
+                    continue
                 actual_function = getattr(backend, function, None) if isinstance(function, basestring) else function
 
                 if callable(actual_function):
@@ -1224,3 +1246,4 @@ class ReplApplication(Cmd, ConsoleApplication):
 
     def flush(self):
         self.formatter.flush()
+        self.formatter.close_sink()
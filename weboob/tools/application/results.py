@@ -17,7 +17,12 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
+import re
+from datetime import date, datetime, timedelta
+
+import weboob.tools.date as date_utils
 from weboob.capabilities import UserError
+from weboob.capabilities.base import BaseObject
 
 
 __all__ = ['ResultsCondition', 'ResultsConditionError']
@@ -61,6 +66,78 @@ def is_in(left, right):
 functions = {'!=': is_notegal, '=': is_egal, '>': is_sup, '<': is_inf, '|': is_in}
 
 
+TIMEDELTA_RE = re.compile(r'^\s*((?P<hours>\d+)\s*h)?\s*((?P<minutes>\d+)\s*m)?\s*((?P<seconds>\d+)\s*s)?\s*$')
+
+
+def convert_operand(value, right):
+    """
+    Convert the right operand, always given as a string by application, to
+    the type of a value.
+    """
+    if isinstance(value, date_utils.date):
+        return date(*[int(x) for x in right.split('-')])
+    elif isinstance(value, date_utils.datetime):
+        splitted_datetime = right.split(' ')
+        return datetime(*([int(x) for x in splitted_datetime[0].split('-')] +
+                          [int(x) for x in splitted_datetime[1].split(':')]))
+    elif isinstance(value, timedelta):
+        time_dict = TIMEDELTA_RE.match(right).groupdict()
+        return timedelta(seconds=int(time_dict['seconds'] or "0"),
+                         minutes=int(time_dict['minutes'] or "0"),
+                         hours=int(time_dict['hours'] or "0"))
+    else:
+        return type(value)(right)
+
+
+class InvalidOperand(object):
+    pass
+
+
+class Predicate(object):
+    """
+    A compiled condition.
+
+    The right operand is converted once for each type of value met, and
+    the result is kept for next objects.
+    """
+
+    def __init__(self, condition):
+        self.field = condition.left
+        self.function = functions[condition.op]
+        self.right = condition.right
+        self.operands = {}
+
+    def get_operand(self, value):
+        typed = type(value)
+        try:
+            return self.operands[typed]
+        except KeyError:
+            try:
+                operand = convert_operand(value, self.right)
+            except Exception:
+                # The operand can't be compared to values of this type.
+                operand = InvalidOperand
+            self.operands[typed] = operand
+            return operand
+
+    def __call__(self, value):
+        operand = self.get_operand(value)
+        if operand is InvalidOperand:
+            return False
+        try:
+            return self.function(operand, value)
+        except (TypeError, ValueError, ArithmeticError):
+            return False
+
+    def missing(self):
+        raise ResultsConditionError(u'Field "%s" is not valid.' % self.field)
+
+
+def has_default_to_dict(cls):
+    to_dict = getattr(cls, 'to_dict', None)
+    return getattr(to_dict, 'im_func', None) is BaseObject.to_dict.im_func
+
+
 class ResultsCondition(IResultsCondition):
     condition_str = None
 
@@ -96,57 +173,130 @@ class ResultsCondition(IResultsCondition):
             or_list.append(and_list)
         self.condition = or_list
         self.condition_str = condition_str
+        # Functions evaluating the expression on each class of objects.
+        self.compiled = {}
 
     def is_valid(self, obj):
-        import weboob.tools.date as date_utils
-        import re
-        from datetime import date, datetime, timedelta
-        d = obj.to_dict()
-        # We evaluate all member of a list at each iteration.
+        try:
+            evaluate = self.compiled[obj.__class__]
+        except KeyError:
+            evaluate = self.compiled[obj.__class__] = self.compile(obj.__class__)
+        return evaluate(obj)
+
+    def compile(self, cls):
+        """
+        Build a function evaluating the expression on objects of a class.
+
+        Fields are read directly on objects, unless the class changes the
+        way they are exported with a custom ``to_dict()``.
+        """
+        use_dict = not has_default_to_dict(cls)
+        fields = getattr(cls, '_fields', None) or {}
+
+        or_list = []
         for _or in self.condition:
-            myeval = True
+            and_list = []
             for condition in _or:
-                if condition.left in d:
-                    # in the case of id, test id@backend and id
-                    if condition.left == 'id':
-                        tocompare = condition.right
-                        evalfullid = functions[condition.op](tocompare, d['id'])
-                        evalid = functions[condition.op](tocompare, obj.id)
-                        myeval = evalfullid or evalid
-                    else:
-                        # We have to change the type of v, always gived as string by application
-                        typed = type(d[condition.left])
-                        try:
-                            if isinstance(d[condition.left], date_utils.date):
-                                tocompare = date(*[int(x) for x in condition.right.split('-')])
-                            elif isinstance(d[condition.left], date_utils.datetime):
-                                splitted_datetime = condition.right.split(' ')
-                                tocompare = datetime(*([int(x) for x in splitted_datetime[0].split('-')] +
-                                                       [int(x) for x in splitted_datetime[1].split(':')]))
-                            elif isinstance(d[condition.left], timedelta):
-                                time_dict = re.match('^\s*((?P<hours>\d+)\s*h)?\s*((?P<minutes>\d+)\s*m)?\s*((?P<seconds>\d+)\s*s)?\s*$',
-                                                     condition.right).groupdict()
-                                tocompare = timedelta(seconds=int(time_dict['seconds'] or "0"),
-                                                      minutes=int(time_dict['minutes'] or "0"),
-                                                      hours=int(time_dict['hours'] or "0"))
-                            else:
-                                tocompare = typed(condition.right)
-                            myeval = functions[condition.op](tocompare, d[condition.left])
-                        except:
-                            myeval = False
+                predicate = Predicate(condition)
+                if predicate.field == 'id':
+                    and_list.append(self.compile_id(predicate, use_dict))
+                elif use_dict:
+                    and_list.append(self.compile_dict_field(predicate))
+                elif predicate.field in fields:
+                    and_list.append(self.compile_field(predicate))
                 else:
-                    raise ResultsConditionError(u'Field "%s" is not valid.' % condition.left)
-                # Do not try all AND conditions if one is false
-                if not myeval:
-                    break
-            # Return True at the first OR valid condition
-            if myeval:
-                return True
-        # If we are here, all OR conditions are False
-        return False
+                    and_list.append(lambda obj, d, predicate=predicate: predicate.missing())
+            or_list.append(and_list)
+
+        def evaluate(obj):
+            d = obj.to_dict() if use_dict else None
+            # Do not try all AND conditions if one is false, and return True
+            # at the first OR valid condition.
+            return any(all(term(obj, d) for term in and_list) for and_list in or_list)
+
+        return evaluate
+
+    def compile_id(self, predicate, use_dict):
+        function = predicate.function
+        right = predicate.right
+
+        # in the case of id, test id@backend and id
+        def term(obj, d):
+            if use_dict:
+                if 'id' not in d:
+                    predicate.missing()
+                fullid = d['id']
+            else:
+                if getattr(obj, 'id', None) is None:
+                    predicate.missing()
+                fullid = obj.fullid if obj.backend is not None else obj.id
+            return function(right, fullid) or function(right, obj.id)
+        return term
+
+    def compile_dict_field(self, predicate):
+        field = predicate.field
+
+        def term(obj, d):
+            if field not in d:
+                predicate.missing()
+            return predicate(d[field])
+        return term
+
+    def compile_field(self, predicate):
+        field = predicate.field
+
+        def term(obj, d):
+            return predicate(obj._fields[field].value)
+        return term
+
+    def get_backends(self):
+        """
+        Get names of backends results can come from, when every alternative
+        of the expression requires an id in form ``id@backend``.
+
+        :rtype: set or None
+        """
+        backends = set()
+        for _or in self.condition:
+            names = [condition.right.rpartition('@')[2] for condition in _or
+                     if condition.left == 'id' and condition.op == '=' and '@' in condition.right]
+            if not names:
+                return None
+            backends.update(names[:1])
+        return backends
 
     def __str__(self):
         return unicode(self).encode('utf-8')
 
     def __unicode__(self):
         return self.condition_str
+
+
+def test():
+    from decimal import Decimal
+    from weboob.capabilities.base import DecimalField, Field
+
+    class Item(BaseObject):
+        amount = DecimalField('Amount')
+        date = Field('Date', date_utils.date)
+
+    obj = Item(u'1', backend='foo')
+    obj.amount = Decimal('12.5')
+    obj.date = date_utils.date(2016, 3, 1)
+
+    assert ResultsCondition(u'amount>10').is_valid(obj)
+    assert not ResultsCondition(u'amount<10').is_valid(obj)
+    assert ResultsCondition(u'amount<10 OR date>2016-02-01').is_valid(obj)
+    assert not ResultsCondition(u'amount>10 AND date=2016-01-01').is_valid(obj)
+    assert not ResultsCondition(u'amount=foo').is_valid(obj)
+    assert ResultsCondition(u'id=1@foo').is_valid(obj)
+    assert ResultsCondition(u'id=1').is_valid(obj)
+    assert ResultsCondition(u'id=1@foo OR id=2@bar').get_backends() == set(['foo', 'bar'])
+    assert ResultsCondition(u'id=1@foo OR amount>10').get_backends() is None
+
+    try:
+        ResultsCondition(u'nope=1').is_valid(obj)
+    except ResultsConditionError:
+        pass
+    else:
+        assert False, 'unknown fields must be rejected'
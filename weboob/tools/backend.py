@@ -249,6 +249,12 @@ class Module(object):
     # When the method is called, fields are only the one which are
     # NOT yet filled.
     OBJECTS = {}
+    # Number of objects given at once to fill_many().
+    # The default implementation fills them concurrently, so it can be
+    # raised by modules whose fill methods do not rely on browser's state
+    # (like the current page), or which override fill_many() to use a bulk
+    # API.
+    FILL_BATCH_SIZE = 1
 
     class ConfigError(Exception):
         """
@@ -440,3 +446,30 @@ class Module(object):
             setattr(obj, field, NotAvailable)
 
         return obj
+
+    def fill_many(self, objs, fields=None):
+        """
+        Fill several objects with the wanted fields.
+
+        Objects are filled in place, concurrently with :meth:`fillobj` when
+        there are more than one. Modules able to fill objects in bulk can
+        override this method.
+
+        :param objs: objects to fill
+        :type objs: :class:`list`
+        :param fields: what fields to fill; if None, all fields are filled
+        :type fields: :class:`list`
+        """
+        if len(objs) <= 1:
+            for obj in objs:
+                self.fillobj(obj, fields)
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(max_workers=len(objs))
+        try:
+            for future in [executor.submit(self.fillobj, obj, fields) for obj in objs]:
+                future.result()
+        finally:
+            executor.shutdown(wait=False)
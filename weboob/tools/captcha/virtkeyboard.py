@@ -26,6 +26,11 @@ try:
 except ImportError:
     raise ImportError('Please install python-imaging')
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class VirtKeyboardError(Exception):
     pass
@@ -83,6 +88,7 @@ class VirtKeyboard(object):
 
         self.width, self.height = self.image.size
         self.pixar = self.image.load()
+        self._mask = None
 
     def load_symbols(self, coords):
         self.coords = {}
@@ -94,15 +100,54 @@ class VirtKeyboard(object):
             self.coords[i] = coord
             self.md5[i] = self.checksum(self.coords[i])
 
+        self._symbols_by_md5 = {}
+        for i in self.md5:
+            self._symbols_by_md5.setdefault(self.md5[i], i)
+
     def check_color(self, pixel):
         return pixel == self.color
 
+    def get_mask(self):
+        """
+        Get a boolean array telling which pixels have the color of symbols,
+        indexed by (y, x).
+
+        :returns: the array, or None if NumPy is not installed or if
+                  :meth:`check_color` is overridden
+        """
+        if getattr(self, '_mask', None) is None:
+            if numpy is None or type(self).check_color.__func__ is not VirtKeyboard.check_color.__func__:
+                return None
+
+            image = self.image
+            if image.mode == '1':
+                # Pixels of bilevel images are read as 0 or 255.
+                image = image.convert('L')
+            pixels = numpy.asarray(image)
+            if pixels.ndim == 2:
+                if isinstance(self.color, (int, long, float)):
+                    self._mask = pixels == self.color
+                else:
+                    self._mask = numpy.zeros(pixels.shape, dtype=bool)
+            else:
+                self._mask = (pixels == numpy.array(self.color)).all(axis=2)
+        return self._mask
+
     def get_symbol_coords(self, coords):
         (x1, y1, x2, y2) = coords
         if self.margin:
             top, right, bottom, left = self.margin
             x1, y1, x2, y2 = x1 + left, y1 + top, x2 - right, y2 - bottom
 
+        mask = self.get_mask()
+        if mask is not None and x1 >= 0 and y1 >= 0:
+            symbol = mask[y1:y2 + 1, x1:x2 + 1]
+            rows = symbol.any(axis=1).nonzero()[0]
+            if not len(rows):
+                return (-1, -1, -1, -1)
+            columns = symbol.any(axis=0).nonzero()[0]
+            return (x1 + int(columns[0]), y1 + int(rows[0]), x1 + int(columns[-1]), y1 + int(rows[-1]))
+
         newY1 = -1
         newY2 = -1
         for y in range(y1, min(y2 + 1, self.height)):
@@ -131,6 +176,11 @@ class VirtKeyboard(object):
 
     def checksum(self, coords):
         (x1, y1, x2, y2) = coords
+        mask = self.get_mask()
+        if mask is not None and x1 >= 0 and y1 >= 0:
+            symbol = mask[y1:y2 + 1, x1:x2 + 1]
+            return hashlib.md5(numpy.where(symbol, ord('.'), ord(' ')).astype(numpy.uint8).tostring()).hexdigest()
+
         s = ''
         for y in range(y1, min(y2 + 1, self.height)):
             for x in range(x1, min(x2 + 1, self.width)):
@@ -144,7 +194,10 @@ class VirtKeyboard(object):
         if isinstance(md5sum_list, basestring):
             md5sum_list = [md5sum_list]
 
+        symbols = getattr(self, '_symbols_by_md5', {})
         for md5sum in md5sum_list:
+            if md5sum in symbols and self.md5.get(symbols[md5sum]) == md5sum:
+                return symbols[md5sum]
             for i in self.md5:
                 if md5sum == self.md5[i]:
                     return i
@@ -235,3 +288,33 @@ class GridVirtKeyboard(VirtKeyboard):
         super(GridVirtKeyboard, self).__init__()
 
         self.load_symbols(coords)
+
+
+def test():
+    from io import BytesIO
+    from PIL import ImageDraw
+
+    global numpy
+
+    image = Image.new('RGB', (60, 20), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.line((3, 4, 8, 15), fill=(0, 0, 0))
+    draw.rectangle((24, 2, 27, 17), fill=(0, 0, 0))
+    draw.point((45, 10), fill=(0, 0, 0))
+    f = BytesIO()
+    image.save(f, 'PNG')
+
+    keyboards = []
+    for use_numpy in (True, False):
+        saved, numpy = numpy, (numpy if use_numpy else None)
+        try:
+            f.seek(0)
+            keyboards.append(GridVirtKeyboard('abc', 3, 1, f, (0, 0, 0)))
+        finally:
+            numpy = saved
+
+    fast, slow = keyboards
+    assert fast.coords == slow.coords == {'a': (3, 4, 8, 15), 'b': (24, 2, 27, 17), 'c': (45, 10, 45, 10)}
+    assert fast.md5 == slow.md5
+    assert fast.md5['c'] == hashlib.md5('.').hexdigest()
+    assert fast.get_symbol_code(['unknown', slow.md5['b']]) == 'b'
@@ -17,7 +17,6 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-import dateutil.parser
 from datetime import date as real_date, datetime as real_datetime, timedelta
 import time
 import re
@@ -299,6 +298,8 @@ def parse_french_date(date, **kwargs):
     if 'dayfirst' not in kwargs:
         kwargs['dayfirst'] = True
 
+    # The parser is slow to import, and rarely used by applications.
+    import dateutil.parser
     return dateutil.parser.parse(date, **kwargs)
 
 
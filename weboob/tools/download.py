@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+import hashlib
+import os
+import re
+import sys
+import time
+from threading import Lock
+
+from weboob.browser.exceptions import ClientError
+from weboob.tools.json import json
+from weboob.tools.log import getLogger
+
+
+__all__ = ['DownloadError', 'Downloader', 'split_ranges', 'download_file']
+
+
+class DownloadError(Exception):
+    pass
+
+
+CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+)')
+
+
+def split_ranges(size, parts, min_size=1):
+    """
+    Split a file in ranges of bytes.
+
+    :returns: list of [start, end] ranges, end is excluded
+
+    >>> split_ranges(10, 3)
+    [[0, 4], [4, 8], [8, 10]]
+    >>> split_ranges(10, 3, min_size=6)
+    [[0, 6], [6, 10]]
+    >>> split_ranges(0, 4)
+    []
+    """
+    if size <= 0:
+        return []
+    part_size = max(-(-size // parts), min_size)
+    return [[start, min(start + part_size, size)] for start in range(0, size, part_size)]
+
+
+class Downloader(object):
+    """
+    Download a file with several connections.
+
+    When the server supports ranges, the file is split into parts, which
+    are downloaded in parallel with HTTP Range requests and written in
+    place into a preallocated file. The download state is saved next to
+    the file, so an interrupted download is resumed.
+
+    Requests are made with a :class:`weboob.browser.browsers.Browser`, so
+    cookies, headers and proxies of a backend browser are used.
+
+    :param browser: browser used to make requests, default is a new one
+    :type browser: :class:`weboob.browser.browsers.Browser`
+    :param connections: maximum number of parallel connections
+    :type connections: int
+    :param progress: function called with the number of bytes downloaded
+                     by this call, the size of the file and the elapsed time
+                     in seconds
+    :type progress: callable
+    """
+
+    CHUNK_SIZE = 65536
+    """
+    Size of chunks read from connections.
+    """
+
+    MIN_PART_SIZE = 1048576
+    """
+    Files are not split into parts smaller than this size.
+    """
+
+    def __init__(self, browser=None, connections=4, progress=None, logger=None):
+        if browser is None:
+            from weboob.browser import Browser
+            browser = Browser(logger=logger)
+        self.browser = browser
+        self.connections = connections
+        self.progress = progress
+        self.logger = getLogger('download', logger)
+        self.lock = Lock()
+
+    def download(self, url, dest, size=None, checksum=None):
+        """
+        Download a file.
+
+        :param url: URL of file
+        :type url: str
+        :param dest: path of the output file
+        :type dest: str
+        :param size: expected size of file
+        :type size: int
+        :param checksum: expected checksum of file, as a tuple of the
+                         :mod:`hashlib` algorithm name and the hexadecimal
+                         digest
+        :type checksum: tuple
+        :raises: :class:`DownloadError` if the downloaded file is not valid
+        :returns: size of file
+        """
+        self.downloaded = 0
+        self.start = time.time()
+
+        total = self.probe(url)
+        if total is None:
+            self.logger.debug('Server does not support ranges, downloading with one connection')
+            total = self.download_single(url, dest)
+        else:
+            self.download_ranges(url, dest, total)
+
+        self.verify(dest, total if size is None else size, checksum)
+        return total
+
+    def probe(self, url):
+        """
+        Check if the server supports ranges.
+
+        :returns: size of file, or None if ranges are not supported
+        """
+        try:
+            response = self.browser.open(url, headers={'Range': 'bytes=0-0'}, stream=True)
+        except ClientError as e:
+            # 416 Range Not Satisfiable is returned for empty files.
+            if e.response.status_code == 416:
+                return None
+            raise
+
+        try:
+            if response.status_code != 206:
+                return None
+            m = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            if not m:
+                return None
+            return int(m.group(3))
+        finally:
+            response.close()
+
+    def download_single(self, url, dest):
+        response = self.browser.open(url, stream=True)
+        size = 0
+        try:
+            with open(dest, 'wb') as f:
+                for chunk in response.iter_content(self.CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+                    self.report(len(chunk), None)
+        finally:
+            response.close()
+        return size
+
+    def download_ranges(self, url, dest, total):
+        from concurrent.futures import ThreadPoolExecutor
+
+        state_path = '%s.download' % dest
+        parts = self.load_state(state_path, url, dest, total)
+        if parts is None:
+            # Each part is a list of [start, end, downloaded bytes].
+            parts = [r + [0] for r in split_ranges(total, self.connections, self.MIN_PART_SIZE)]
+            with open(dest, 'wb') as f:
+                f.truncate(total)
+            self.save_state(state_path, url, total, parts)
+        else:
+            self.logger.info('Resuming download of %s' % dest)
+
+        # Only bytes flushed to the file are saved in the state, so parts
+        # which are being written by other threads are resumed correctly.
+        saved = [list(part) for part in parts]
+        executor = ThreadPoolExecutor(max_workers=self.connections)
+        futures = []
+        try:
+            futures = [executor.submit(self.download_part, url, dest, state_path, total, saved, part, saved_part)
+                       for part, saved_part in zip(parts, saved) if part[0] + part[2] < part[1]]
+            for future in futures:
+                future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        os.remove(state_path)
+
+    def download_part(self, url, dest, state_path, total, saved, part, saved_part):
+        start, end, done = part
+        headers = {'Range': 'bytes=%d-%d' % (start + done, end - 1)}
+        response = self.browser.open(url, headers=headers, stream=True)
+        try:
+            if response.status_code != 206:
+                raise DownloadError('Server ignored range request (status %d)' % response.status_code)
+
+            with open(dest, 'r+b') as f:
+                f.seek(start + done)
+                try:
+                    for chunk in response.iter_content(self.CHUNK_SIZE):
+                        chunk = chunk[:end - start - part[2]]
+                        f.write(chunk)
+                        part[2] += len(chunk)
+                        self.report(len(chunk), total)
+                        if part[0] + part[2] >= end:
+                            break
+                        if part[2] - done >= self.MIN_PART_SIZE:
+                            # Save the state from time to time to be able to resume.
+                            done = self.save_part(f, state_path, url, total, saved, part, saved_part)
+                finally:
+                    self.save_part(f, state_path, url, total, saved, part, saved_part)
+        finally:
+            response.close()
+
+        if part[0] + part[2] < end:
+            raise DownloadError('Connection closed before the end of range %d-%d' % (start, end - 1))
+
+    def save_part(self, f, state_path, url, total, saved, part, saved_part):
+        f.flush()
+        with self.lock:
+            saved_part[2] = part[2]
+        self.save_state(state_path, url, total, saved)
+        return part[2]
+
+    def report(self, size, total):
+        with self.lock:
+            self.downloaded += size
+            if self.progress:
+                self.progress(self.downloaded, total, time.time() - self.start)
+
+    def verify(self, dest, size, checksum):
+        real_size = os.path.getsize(dest)
+        if real_size != size:
+            raise DownloadError('File %s has %d bytes instead of %d' % (dest, real_size, size))
+
+        if checksum is not None:
+            algorithm, digest = checksum
+            h = hashlib.new(algorithm)
+            with open(dest, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                    h.update(chunk)
+            if h.hexdigest().lower() != digest.lower():
+                raise DownloadError('File %s has a wrong %s checksum' % (dest, algorithm))
+
+    def load_state(self, path, url, dest, total):
+        """
+        Get parts of a previous download of the same file.
+        """
+        if not os.path.exists(path) or not os.path.exists(dest):
+            return None
+
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except ValueError:
+            return None
+
+        if state.get('url') != url or state.get('size') != total or os.path.getsize(dest) != total:
+            return None
+        return state['parts']
+
+    def save_state(self, path, url, total, parts):
+        with self.lock:
+            with open(path, 'w') as f:
+                json.dump({'url': url, 'size': total, 'parts': parts}, f)
+
+
+def download_file(url, dest, browser=None, stdout=None, stderr=None, logger=None):
+    """
+    Download a file with a :class:`Downloader`, and print the progress when
+    the output is a terminal.
+
+    This is used by console applications to download files over HTTP.
+
+    :param browser: browser of the backend, it is used if it is a
+                    :class:`weboob.browser.browsers.Browser`
+    :returns: exit code, 0 on success
+    :rtype: int
+    """
+    import requests
+    from weboob.browser import Browser
+
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+
+    def progress(size, total, elapsed):
+        if stdout.isatty():
+            if total:
+                done = '%.1f/%.1f MB' % (size / 1048576., total / 1048576.)
+            else:
+                done = '%.1f MB' % (size / 1048576.)
+            print('\r%s, %.1f kB/s' % (done, size / 1024. / max(elapsed, 0.001)), end='', file=stdout)
+            stdout.flush()
+
+    if not isinstance(browser, Browser):
+        browser = None
+
+    downloader = Downloader(browser, progress=progress, logger=logger)
+    try:
+        size = downloader.download(url, dest)
+    except (DownloadError, requests.exceptions.RequestException) as e:
+        print('', file=stdout)
+        print('Unable to download %s: %s' % (url, e), file=stderr)
+        return 1
+
+    print('\rDownloaded %s (%.1f MB)' % (dest, size / 1048576.), file=stdout)
+    return 0
+
+
+def test():
+    import shutil
+    import tempfile
+    import threading
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+    data = ''.join(chr(i % 251) for i in range(40000))
+    ranges = []
+    interrupted = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            m = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+            start = None
+            if m is None:
+                self.send_response(200)
+                body = data
+            else:
+                start, end = int(m.group(1)), int(m.group(2))
+                ranges.append((start, end))
+                body = data[start:end + 1]
+                self.send_response(206)
+                self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, len(data)))
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if start == 20000 and not interrupted:
+                # Close the connection in the middle of the third part.
+                interrupted.append(True)
+                self.wfile.write(body[:6000])
+                self.wfile.flush()
+                self.close_connection = 1
+                return
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        url = 'http://127.0.0.1:%d/file' % server.server_port
+        dest = os.path.join(tmpdir, 'file')
+
+        downloader = Downloader(connections=4)
+        downloader.MIN_PART_SIZE = 1000
+        downloader.CHUNK_SIZE = 500
+        try:
+            downloader.download(url, dest)
+        except (DownloadError, IOError):
+            pass
+        else:
+            assert False, 'the download should have been interrupted'
+
+        with open(dest + '.download') as f:
+            parts = json.load(f)['parts']
+        assert [part[:2] for part in parts] == [[0, 10000], [10000, 20000], [20000, 30000], [30000, 40000]]
+        assert [part[2] for part in parts if part[0] != 20000] == [10000] * 3, parts
+        resumed = parts[2][2]
+        assert 0 < resumed <= 6000, parts
+        # Saved bytes are really written.
+        with open(dest, 'rb') as f:
+            f.seek(20000)
+            assert f.read(resumed) == data[20000:20000 + resumed]
+
+        del ranges[:]
+        checksum = ('sha1', hashlib.sha1(data).hexdigest())
+        assert downloader.download(url, dest, size=len(data), checksum=checksum) == len(data)
+        assert ranges == [(0, 0), (20000 + resumed, 29999)], ranges
+        assert open(dest, 'rb').read() == data
+        assert not os.path.exists(dest + '.download')
+
+        try:
+            downloader.download(url, dest, checksum=('sha1', '0' * 40))
+        except DownloadError:
+            pass
+        else:
+            assert False, 'the checksum should be wrong'
+    finally:
+        shutil.rmtree(tmpdir)
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import re
+import time
+from collections import deque
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+from weboob.tools.json import json
+from weboob.tools.log import getLogger
+
+
+__all__ = ['HLSError', 'Playlist', 'Variant', 'parse_playlist', 'HLSDownloader']
+
+
+class HLSError(Exception):
+    pass
+
+
+class Variant(object):
+    """
+    A stream of a master playlist.
+    """
+
+    def __init__(self, url, bandwidth=0, resolution=None, codecs=None):
+        self.url = url
+        self.bandwidth = bandwidth
+        self.resolution = resolution
+        self.codecs = codecs
+
+    def __repr__(self):
+        return '<Variant bandwidth=%r resolution=%r url=%r>' % (self.bandwidth, self.resolution, self.url)
+
+
+class Playlist(object):
+    """
+    A parsed M3U8 playlist.
+
+    A master playlist only has variants, a media playlist only has segments.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.variants = []
+        self.segments = []
+
+    @property
+    def is_master(self):
+        return len(self.variants) > 0
+
+
+ATTRIBUTES_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parse_attributes(line):
+    """
+    Parse the attributes list of a tag.
+
+    >>> sorted(parse_attributes('#EXT-X-STREAM-INF:BANDWIDTH=1280000,CODECS="avc1.4d401f,mp4a.40.2"').items())
+    [('BANDWIDTH', '1280000'), ('CODECS', 'avc1.4d401f,mp4a.40.2')]
+    """
+    attrs = {}
+    for key, value in ATTRIBUTES_RE.findall(line.partition(':')[2]):
+        attrs[key] = value.strip('"')
+    return attrs
+
+
+def parse_playlist(text, url):
+    """
+    Parse a M3U8 playlist.
+
+    URLs of variants and segments are made absolute.
+
+    >>> p = parse_playlist('''#EXTM3U
+    ... #EXT-X-STREAM-INF:BANDWIDTH=1280000,RESOLUTION=640x360
+    ... low/index.m3u8
+    ... #EXT-X-STREAM-INF:BANDWIDTH=2560000,RESOLUTION=1280x720
+    ... http://cdn.example.org/high/index.m3u8
+    ... ''', 'http://example.org/video/master.m3u8')
+    >>> p.is_master
+    True
+    >>> for v in p.variants:
+    ...     print((v.bandwidth, v.resolution, v.url))
+    (1280000, '640x360', 'http://example.org/video/low/index.m3u8')
+    (2560000, '1280x720', 'http://cdn.example.org/high/index.m3u8')
+    >>> p = parse_playlist('''#EXTM3U
+    ... #EXT-X-TARGETDURATION:10
+    ... #EXTINF:9.009,
+    ... segment0.ts
+    ... #EXTINF:9.009,
+    ... /abs/segment1.ts
+    ... #EXT-X-ENDLIST
+    ... ''', 'http://example.org/video/index.m3u8')
+    >>> p.is_master
+    False
+    >>> p.segments
+    ['http://example.org/video/segment0.ts', 'http://example.org/abs/segment1.ts']
+    """
+    playlist = Playlist(url)
+    stream_inf = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            stream_inf = parse_attributes(line)
+        elif line.startswith('#EXT-X-KEY:'):
+            method = parse_attributes(line).get('METHOD', 'NONE')
+            if method != 'NONE':
+                raise HLSError('Encrypted streams (%s) are not supported' % method)
+        elif line.startswith('#EXT-X-MAP:'):
+            # Initialization section of fragmented MP4 streams.
+            uri = parse_attributes(line).get('URI')
+            if uri:
+                playlist.segments.append(urljoin(url, uri))
+        elif line.startswith('#'):
+            continue
+        elif stream_inf is not None:
+            try:
+                bandwidth = int(stream_inf.get('BANDWIDTH', 0))
+            except ValueError:
+                bandwidth = 0
+            playlist.variants.append(Variant(urljoin(url, line),
+                                             bandwidth,
+                                             stream_inf.get('RESOLUTION'),
+                                             stream_inf.get('CODECS')))
+            stream_inf = None
+        else:
+            playlist.segments.append(urljoin(url, line))
+
+    return playlist
+
+
+class HLSDownloader(object):
+    """
+    Download a HLS stream into a single file.
+
+    Segments are fetched concurrently, but written in order to the output
+    file as soon as they are available. The download state is saved next
+    to the output file, so an interrupted download is resumed.
+
+    :param session: session used to make requests, default is a new
+                    :class:`requests.Session`
+    :type session: :class:`requests.Session`
+    :param max_workers: number of segments fetched in parallel
+    :type max_workers: int
+    :param max_bandwidth: select the best variant under this bandwidth
+                          (bits/s), default is the best one
+    :type max_bandwidth: int
+    :param progress: function called after each written segment, with
+                     the number of written segments, the total number of
+                     segments, the number of written bytes and the elapsed
+                     time in seconds
+    :type progress: callable
+    """
+
+    RETRIES = 3
+
+    def __init__(self, session=None, max_workers=4, max_bandwidth=None, progress=None, logger=None):
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.session = session
+        self.max_workers = max_workers
+        self.max_bandwidth = max_bandwidth
+        self.progress = progress
+        self.logger = getLogger('hls', logger)
+
+    def select_variant(self, variants):
+        """
+        Select the variant to download in a master playlist.
+
+        :rtype: :class:`Variant`
+        """
+        variants = sorted(variants, key=lambda v: v.bandwidth)
+        if self.max_bandwidth:
+            below = [v for v in variants if v.bandwidth <= self.max_bandwidth]
+            if below:
+                return below[-1]
+            return variants[0]
+        return variants[-1]
+
+    def get_playlist(self, url):
+        """
+        Get the media playlist to download, selecting a variant if the URL
+        is a master playlist.
+
+        :rtype: :class:`Playlist`
+        """
+        for i in range(5):
+            r = self.session.get(url)
+            r.raise_for_status()
+            playlist = parse_playlist(r.text, r.url)
+            if not playlist.is_master:
+                return playlist
+
+            variant = self.select_variant(playlist.variants)
+            self.logger.debug('Selected variant %r' % variant)
+            url = variant.url
+
+        raise HLSError('Too many nested playlists')
+
+    def fetch_segment(self, url):
+        for i in range(self.RETRIES):
+            try:
+                r = self.session.get(url)
+                r.raise_for_status()
+            except Exception as e:
+                if i + 1 == self.RETRIES:
+                    raise
+                self.logger.warning('Unable to get segment %s (%s), retrying' % (url, e))
+            else:
+                return r.content
+
+    def download(self, url, dest):
+        """
+        Download a stream.
+
+        :param url: URL of a master or media playlist
+        :type url: str
+        :param dest: output file
+        :type dest: str
+        :returns: number of bytes of the output file
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        playlist = self.get_playlist(url)
+        if not playlist.segments:
+            raise HLSError('Playlist %s has no segment' % playlist.url)
+
+        state_path = '%s.hls' % dest
+        done, size = self.load_state(state_path, url, dest)
+
+        total = len(playlist.segments)
+        written = 0
+        start = time.time()
+        pending = deque()
+        segments = iter(enumerate(playlist.segments[done:], done))
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            with open(dest, 'r+b' if done else 'wb') as f:
+                f.seek(size)
+                f.truncate()
+                while True:
+                    # Keep the queue filled to let workers fetch next
+                    # segments while the first one is written.
+                    while len(pending) < self.max_workers * 2:
+                        try:
+                            i, segment_url = next(segments)
+                        except StopIteration:
+                            break
+                        pending.append((i, executor.submit(self.fetch_segment, segment_url)))
+
+                    if not pending:
+                        break
+
+                    i, future = pending.popleft()
+                    data = future.result()
+                    f.write(data)
+                    f.flush()
+                    size += len(data)
+                    written += len(data)
+                    self.save_state(state_path, url, i + 1, size)
+                    if self.progress:
+                        self.progress(i + 1, total, written, time.time() - start)
+        finally:
+            for i, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        os.remove(state_path)
+        return size
+
+    def load_state(self, path, url, dest):
+        """
+        Get the number of segments and bytes already written by a previous
+        download of the same stream.
+        """
+        if not os.path.exists(path) or not os.path.exists(dest):
+            return 0, 0
+
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except ValueError:
+            return 0, 0
+
+        if state.get('url') != url or os.path.getsize(dest) < state.get('size', 0):
+            return 0, 0
+
+        self.logger.info('Resuming download after %d segments' % state['segments'])
+        return state['segments'], state['size']
+
+    def save_state(self, path, url, segments, size):
+        with open(path, 'w') as f:
+            json.dump({'url': url, 'segments': segments, 'size': size}, f)
+
+
+def test():
+    import shutil
+    import tempfile
+    import threading
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+    import requests
+
+    SEGMENTS = 6
+    requested = []
+    failing = set(['/high/3.ts'])
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/master.m3u8':
+                body = '#EXTM3U\n'
+                for bandwidth, name in ((1000000, 'low'), (3000000, 'high'), (2000000, 'medium')):
+                    body += '#EXT-X-STREAM-INF:BANDWIDTH=%d\n%s/index.m3u8\n' % (bandwidth, name)
+            elif self.path.endswith('/index.m3u8'):
+                body = '#EXTM3U\n#EXT-X-TARGETDURATION:1\n'
+                body += ''.join('#EXTINF:1,\n%d.ts\n' % i for i in range(SEGMENTS))
+                body += '#EXT-X-ENDLIST\n'
+            else:
+                requested.append(self.path)
+                if self.path in failing:
+                    self.send_error(500)
+                    return
+                # First segments are the slowest, to check they are
+                # written in order anyway.
+                i = int(self.path.rsplit('/', 1)[1].split('.')[0])
+                time.sleep(0.01 * (SEGMENTS - i))
+                body = '%s;' % self.path
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        url = 'http://127.0.0.1:%d/master.m3u8' % server.server_port
+        dest = os.path.join(tmpdir, 'video.ts')
+        expected = ''.join('/high/%d.ts;' % i for i in range(SEGMENTS))
+
+        downloader = HLSDownloader(max_workers=4)
+        downloader.RETRIES = 1
+        try:
+            downloader.download(url, dest)
+        except requests.HTTPError:
+            pass
+        else:
+            assert False, 'segment 3 should have failed'
+        # Segments before the failing one are saved.
+        assert open(dest, 'rb').read() == expected[:expected.index('/high/3.ts')]
+        assert os.path.exists(dest + '.hls')
+
+        failing.clear()
+        del requested[:]
+        assert downloader.download(url, dest) == len(expected)
+        assert open(dest, 'rb').read() == expected
+        assert sorted(requested) == ['/high/%d.ts' % i for i in range(3, SEGMENTS)], requested
+        assert not os.path.exists(dest + '.hls')
+
+        del requested[:]
+        downloader = HLSDownloader(max_bandwidth=2500000)
+        downloader.download(url, dest)
+        assert open(dest, 'rb').read() == expected.replace('high', 'medium')
+    finally:
+        shutil.rmtree(tmpdir)
+        server.shutdown()
+        server.server_close()
@@ -18,10 +18,172 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
-__all__ = ['Javascript']
+__all__ = ['Javascript', 'JavascriptError', 'NodeRuntime', 'get_runtime']
 
 
+import hashlib
+import os
+import subprocess
+from threading import Lock
+
+from weboob.tools.json import json
 from weboob.tools.log import getLogger
+from weboob.tools.misc import find_exe
+
+
+class JavascriptError(Exception):
+    pass
+
+
+class NodeRuntime(object):
+    """
+    Node.js process running scripts for the whole weboob process.
+
+    Scripts are compiled once, and kept by hash. Each call evaluates the
+    script in a new context, so calls do not share any state, like with
+    PyExecJS. The context has the globals of node modules, but scripts must
+    not write to ``process.stdout``, and ``console`` writes to the standard
+    error.
+
+    Requests and results are JSON lines exchanged on the process pipes,
+    one call at a time.
+
+    :param path: path to the node executable
+    :type path: str
+    """
+
+    DRIVER = r"""
+var vm = require('vm');
+var readline = require('readline');
+var scripts = {};
+// Standard output is used for responses.
+var stderr = new console.Console(process.stderr, process.stderr);
+
+function createContext() {
+    // Globals of scripts run by PyExecJS in a node process.
+    var sandbox = {
+        Buffer: Buffer,
+        setTimeout: setTimeout,
+        clearTimeout: clearTimeout,
+        setInterval: setInterval,
+        clearInterval: clearInterval,
+        setImmediate: setImmediate,
+        clearImmediate: clearImmediate,
+        require: require,
+        process: process,
+        console: stderr,
+        module: {exports: {}}
+    };
+    sandbox.exports = sandbox.module.exports;
+    sandbox.global = sandbox;
+    return vm.createContext(sandbox);
+}
+
+function handle(request) {
+    if (request.source !== undefined) {
+        scripts[request.key] = new vm.Script(request.source);
+        return null;
+    }
+    var script = scripts[request.key];
+    if (script === undefined)
+        throw new Error('Unknown script ' + request.key);
+    var ctx = createContext();
+    script.runInContext(ctx);
+    return ctx[request.name].apply(ctx, request.args);
+}
+
+readline.createInterface({input: process.stdin, terminal: false}).on('line', function(line) {
+    var response;
+    try {
+        var result = handle(JSON.parse(line));
+        response = JSON.stringify({result: result === undefined ? null : result});
+    } catch (e) {
+        response = JSON.stringify({error: String(e && e.stack || e)});
+    }
+    process.stdout.write(response + '\n');
+}).on('close', function() {
+    process.exit(0);
+});
+"""
+
+    def __init__(self, path):
+        self.path = path
+        self.process = None
+        self.scripts = set()
+        self.lock = Lock()
+
+    def start(self):
+        with open(os.devnull, 'w') as devnull:
+            self.process = subprocess.Popen([self.path, '-e', self.DRIVER],
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=devnull, close_fds=True)
+        self.scripts.clear()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process = None
+
+    def _request(self, request):
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        self.process.stdin.write(json.dumps(request) + '\n')
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if not line:
+            self.process = None
+            raise JavascriptError('node exited unexpectedly')
+        response = json.loads(line)
+        if 'error' in response:
+            raise JavascriptError(response['error'])
+        return response['result']
+
+    def compile(self, source):
+        """
+        Compile a script.
+
+        :rtype: :class:`NodeContext`
+        """
+        if isinstance(source, unicode):
+            source = source.encode('utf-8')
+        return NodeContext(self, hashlib.sha1(source).hexdigest(), source)
+
+    def call(self, key, source, name, *args):
+        with self.lock:
+            if key not in self.scripts:
+                self._request({'key': key, 'source': source.decode('utf-8')})
+                self.scripts.add(key)
+            return self._request({'key': key, 'name': name, 'args': args})
+
+
+class NodeContext(object):
+    def __init__(self, runtime, key, source):
+        self.runtime = runtime
+        self.key = key
+        self.source = source
+
+    def call(self, name, *args):
+        return self.runtime.call(self.key, self.source, name, *args)
+
+
+_runtime = None
+
+
+def get_runtime():
+    """
+    Get the shared node runtime.
+
+    :returns: the runtime, or None if node is not installed
+    :rtype: :class:`NodeRuntime`
+    """
+    global _runtime
+    if _runtime is None:
+        path = find_exe('node') or find_exe('nodejs')
+        if path is None:
+            return None
+        _runtime = NodeRuntime(path)
+    return _runtime
 
 
 class Javascript(object):
@@ -47,14 +209,17 @@ class Javascript(object):
     """
 
     def __init__(self, script, logger=None):
-        try:
-            import execjs
-        except ImportError:
-            raise ImportError('Please install PyExecJS')
-
-        self.runner = execjs.get()
         self.logger = getLogger('js', logger)
 
+        self.runner = get_runtime()
+        if self.runner is None:
+            try:
+                import execjs
+            except ImportError:
+                raise ImportError('Please install node.js or PyExecJS')
+
+            self.runner = execjs.get()
+
         self.ctx = self.runner.compile(self.HEADER + script)
 
     def call(self, *args, **kwargs):
@@ -63,3 +228,26 @@ class Javascript(object):
         self.logger.debug('Calling %s%s = %s', args[0], args[1:], retval)
 
         return retval
+
+
+def test():
+    from weboob.tools.test import SkipTest
+
+    if get_runtime() is None:
+        raise SkipTest('node is not installed')
+
+    js = Javascript('var n = 0; function add(a, b) { n += 1; return [a + b, n, btoa("ab")]; }')
+    assert js.call('add', 1, 2) == [3, 1, 'YWI=']
+    # Calls do not share state.
+    assert js.call('add', u'a', u'é') == [u'aé', 1, 'YWI=']
+    assert Javascript('function f() {}').call('f') is None
+    # Node globals are available, and the console doesn't break responses.
+    js = Javascript('function f() { console.log("f"); setTimeout(function() {}, 0); '
+                    'return [typeof process, typeof module, require("path").basename("/a/b")]; }')
+    assert js.call('f') == ['object', 'object', 'b']
+    try:
+        js.call('missing')
+    except JavascriptError:
+        pass
+    else:
+        assert False, 'calling an unknown function must fail'
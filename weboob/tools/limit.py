@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from threading import local
+
+
+__all__ = ['ResultsLimit', 'limit_results', 'get_limit']
+
+
+_state = local()
+
+
+class ResultsLimit(object):
+    """
+    Number of results wanted by the consumer of a backend call.
+
+    It is set by the application around the iteration on results, and
+    checked by pagination loops, which run in the same thread, to avoid
+    fetching pages nobody will read.
+
+    :param count: number of wanted results, None for no limit
+    :type count: int
+    """
+
+    def __init__(self, count=None):
+        self.count = count
+        self.consumed = 0
+        self.truncated = False
+
+    def consume(self, n=1):
+        """
+        Tell that results have been received by the consumer.
+        """
+        self.consumed += n
+
+    @property
+    def reached(self):
+        return self.count is not None and self.consumed >= self.count
+
+    def can_continue(self):
+        """
+        Check if a pagination loop has to go on the next page.
+
+        When it does not, the limit is marked as truncated, as there are
+        probably more results available.
+
+        :rtype: bool
+        """
+        if self.reached:
+            self.truncated = True
+            return False
+        return True
+
+    def __enter__(self):
+        if not hasattr(_state, 'stack'):
+            _state.stack = []
+        _state.stack.append(self)
+        return self
+
+    def __exit__(self, t, v, tb):
+        _state.stack.remove(self)
+
+
+def limit_results(count):
+    """
+    Limit the results wanted in this thread until the end of the ``with``
+    block.
+
+    >>> with limit_results(2) as limit:
+    ...     limit.consume(2)
+    ...     get_limit().can_continue()
+    False
+    >>> get_limit().can_continue()
+    True
+    """
+    return ResultsLimit(count)
+
+
+def get_limit():
+    """
+    Get the current results limit of this thread.
+
+    :rtype: :class:`ResultsLimit`
+    """
+    stack = getattr(_state, 'stack', None)
+    if stack:
+        return stack[-1]
+    return ResultsLimit()
@@ -136,6 +136,8 @@ def ratelimit(group, delay):
 
     This function is not thread-safe. For reasonably non-critical rate
     limiting (like accessing a website), it should be sufficient nevertheless.
+    To limit requests of a browser in the process, set its RATE_LIMIT
+    attribute instead (see :mod:`weboob.tools.ratelimit`).
 
     @param group [string]  rate limiting group name, alphanumeric
     @param delay [int]  delay in seconds between each call
@@ -18,11 +18,109 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import re
 import subprocess
+import zlib
 from tempfile import mkstemp
 
 
-__all__ = ['decompress_pdf']
+__all__ = ['decompress_pdf', 'UnsupportedPDF']
+
+
+class UnsupportedPDF(Exception):
+    pass
+
+
+STREAM_RE = re.compile(r'>>\s*stream(?:\r\n|\n|\r)')
+FILTER_RE = re.compile(r'/Filter\s*(\[[^\]]*\]|/[^\s/\[<>]+)')
+DECODEPARMS_RE = re.compile(r'/DecodeParms\s*(<<[^<>]*>>|\[\s*(?:<<[^<>]*>>|null|\s)*\])')
+PREDICTOR_RE = re.compile(r'/Predictor\s+(\d+)')
+LENGTH_RE = re.compile(r'/Length\s+(\d+)(\s+\d+\s+R)?')
+
+# Streams with these filters are images, kept compressed as they are not
+# useful to parse text.
+IMAGE_FILTERS = frozenset(['DCTDecode', 'JPXDecode', 'CCITTFaxDecode', 'JBIG2Decode'])
+
+
+def inflate_streams(inpdf):
+    r"""
+    Decompress FlateDecode streams of a PDF document.
+
+    The cross-reference table is not updated, as the result is only meant to
+    be parsed as text.
+
+    :raises: :class:`UnsupportedPDF` if a stream can't be decompressed
+
+    >>> data = zlib.compress('BT\n(Hello) Tj\nET')
+    >>> pdf = '1 0 obj\n<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream\nendobj\n' % (len(data), data)
+    >>> print(inflate_streams(pdf))
+    1 0 obj
+    << /Length 16 >>
+    stream
+    BT
+    (Hello) Tj
+    ET
+    endstream
+    endobj
+    <BLANKLINE>
+    """
+    if '/Encrypt' in inpdf:
+        raise UnsupportedPDF('encrypted document')
+
+    parts = []
+    pos = 0
+    for m in STREAM_RE.finditer(inpdf):
+        start = m.end()
+        if start < pos:
+            # "stream" in the data of the previous stream.
+            continue
+
+        obj = inpdf.rfind('obj', pos, m.start())
+        if obj < 0:
+            raise UnsupportedPDF('stream outside of an object at %d' % m.start())
+        dictionary = inpdf[obj + 3:m.start() + 2]
+
+        length = LENGTH_RE.search(dictionary)
+        end = -1
+        if length and not length.group(2):
+            end = start + int(length.group(1))
+            if not re.match(r'\s*endstream', inpdf[end:end + 12]):
+                end = -1
+        if end < 0:
+            end = inpdf.find('endstream', start)
+            if end < 0:
+                raise UnsupportedPDF('unterminated stream at %d' % start)
+            while end > start and inpdf[end - 1] in '\r\n':
+                end -= 1
+
+        filters = FILTER_RE.search(dictionary)
+        filters = re.findall(r'/([^\s/\[\]]+)', filters.group(1)) if filters else []
+        if filters == ['FlateDecode']:
+            parms = DECODEPARMS_RE.search(dictionary)
+            predictor = PREDICTOR_RE.search(parms.group(0)) if parms else None
+            if predictor and int(predictor.group(1)) > 1:
+                raise UnsupportedPDF('predictor %s at %d' % (predictor.group(1), start))
+            try:
+                data = zlib.decompressobj().decompress(inpdf[start:end])
+            except zlib.error as e:
+                raise UnsupportedPDF('%s at %d' % (e, start))
+
+            dictionary = FILTER_RE.sub('', dictionary)
+            dictionary = DECODEPARMS_RE.sub('', dictionary)
+            dictionary = LENGTH_RE.sub('/Length %d' % len(data), dictionary)
+            dictionary = re.sub(r'  +', ' ', dictionary)
+            parts.append(inpdf[pos:obj + 3])
+            parts.append(dictionary)
+            parts.append(inpdf[m.start() + 2:start])
+            parts.append(data)
+        elif filters and not IMAGE_FILTERS.issuperset(filters[-1:]):
+            raise UnsupportedPDF('filters %s at %d' % (', '.join(filters), start))
+        else:
+            parts.append(inpdf[pos:end])
+        pos = end
+
+    parts.append(inpdf[pos:])
+    return ''.join(parts)
 
 
 def decompress_pdf(inpdf):
@@ -30,10 +128,20 @@ def decompress_pdf(inpdf):
     Takes PDF file contents as a string and returns decompressed version
     of the file contents, suitable for text parsing.
 
+    Streams compressed with zlib are decompressed in memory. Documents with
+    other filters are given to MuPDF.
+
     External dependencies:
-    MuPDF (http://www.mupdf.com).
+    MuPDF (http://www.mupdf.com), for documents not supported in memory.
     """
 
+    try:
+        return inflate_streams(inpdf)
+    except UnsupportedPDF:
+        return mutool_decompress_pdf(inpdf)
+
+
+def mutool_decompress_pdf(inpdf):
     inh, inname = mkstemp(suffix='.pdf')
     outh, outname = mkstemp(suffix='.pdf')
     os.write(inh, inpdf)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2016 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from threading import Lock
+
+
+__all__ = ['TokenBucket', 'get_bucket', 'wait_host']
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket.
+
+    Each call to :meth:`acquire` takes a token. Tokens are added at a
+    constant rate, up to `burst` tokens. When there is no token left, the
+    caller reserves the next one and sleeps until it is available, so
+    waiting threads are served in order, without polling.
+
+    :param rate: tokens added per second
+    :type rate: float
+    :param burst: maximum number of tokens available at once
+    :type burst: int
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.time()
+        self.lock = Lock()
+
+    def reserve(self):
+        """
+        Take a token.
+
+        :returns: time to wait before using it, in seconds
+        :rtype: float
+        """
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """
+        Wait until a token is available, and take it.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def restrict(self, rate, burst=1):
+        """
+        Lower the rate or burst of the bucket, if they are higher than the
+        given ones.
+        """
+        with self.lock:
+            self.rate = min(self.rate, float(rate))
+            self.burst = min(self.burst, burst)
+            self.tokens = min(self.tokens, self.burst)
+
+
+_buckets = {}
+_buckets_lock = Lock()
+
+
+def get_bucket(key, rate, burst=1):
+    """
+    Get the token bucket of the process for a key, like a host name.
+
+    When several callers give different limits for a key, the most
+    restrictive ones are used.
+
+    >>> get_bucket('example.org', 2) is get_bucket('example.org', 5)
+    True
+    >>> get_bucket('example.org', 2).rate
+    2.0
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(rate, burst)
+        elif bucket.rate > rate or bucket.burst > burst:
+            bucket.restrict(rate, burst)
+        return bucket
+
+
+def wait_host(host, rate, burst=1):
+    """
+    Wait until a request can be sent to a host, with requests to this host
+    limited to `rate` per second in the whole process.
+
+    :param host: host name
+    :type host: str
+    :param rate: maximum number of requests per second
+    :type rate: float
+    :param burst: number of requests which can be sent without waiting
+                  after a pause
+    :type burst: int
+    """
+    get_bucket(host, rate, burst).acquire()
+
+
+def test():
+    from threading import Thread
+
+    bucket = TokenBucket(20, burst=2)
+    threads = [Thread(target=lambda: [bucket.acquire() for i in range(3)]) for i in range(4)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 2 tokens at start, and 10 tokens at 20 per second. The upper bound is
+    # loose for slow machines.
+    duration = time.time() - start
+    assert 0.45 < duration < 5, duration
+
+    start = time.time()
+    wait_host('a.example.org', 1)
+    wait_host('b.example.org', 1)
+    assert time.time() - start < 0.5